@@ -207,6 +207,14 @@ a certain state.
 
 (`eng.completed_objects` is empty because both objects passed is halted.)
 
+To only count them, without loading the objects, use:
+
+.. code-block:: python
+
+    eng.count_objects_of_statuses([ObjectVersion.ERROR])  # outputs: 0
+
+    eng.get_object_counts()  # outputs: {ObjectVersion.INITIAL: 2, ...}
+
 This output is actually representative of snapshots of the objects, not the
 objects themselves. The _default_ snapshotting behaviour is also evident here:
 There is one snapshot taken in the beginning of the execution and one
@@ -253,7 +261,8 @@ Workers
 =======
 A worker is a plugin (or bridge) from the Invenio workflows module to some
 distributed task queue. By default, we have provided workers for `Celery`_ and
-`RQ`_.
+`RQ`_. The ``worker_multiprocessing`` worker runs the workflows in a pool of
+local processes, without broker (see :py:mod:`.workers.worker_multiprocessing`).
 
 These plugins are used by the :py:mod:`.worker_engine` to launch workflows
 asynchronously in a task queue.
@@ -23,6 +23,10 @@ If you want to run a workflow using the workflows module,
 this is the high level API you will want to use.
 """
 
+from contextlib import contextmanager
+
+from threading import local
+
 from invenio_base.globals import cfg
 
 from werkzeug.utils import cached_property, import_string
@@ -68,6 +72,92 @@ class WorkerBackend(object):
 
 WORKER = WorkerBackend()
 
+_batch = local()
+
+
+@contextmanager
+def batch():
+    """Group the changes made to workflow objects in one transaction.
+
+    Objects and workflows saved or deleted in the block are committed once
+    at the end of it. Continuations requested with
+    :py:func:`.continue_oid_delayed` are then submitted together with
+    :py:func:`.continue_oids_delayed`.
+
+    Workflows cannot run synchronously in the block, they would commit
+    the changes made so far: :py:func:`.start` or :py:func:`.continue_oid`
+    raise :py:exc:`.errors.WorkflowAPIError`.
+
+    .. code-block:: python
+
+        with batch():
+            for obj in objects:
+                obj.continue_workflow(delayed=True)
+    """
+    from invenio_ext.sqlalchemy import db
+    from .models import update_pending_projections
+
+    if in_batch():
+        yield
+        return
+
+    _batch.continuations = []
+    try:
+        yield
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        continuations = _batch.continuations
+        _batch.continuations = None
+
+    update_pending_projections()
+    groups = []
+    for oid, start_point, kwargs in continuations:
+        for group in groups:
+            if group[1:] == [start_point, kwargs]:
+                group[0].append(oid)
+                break
+        else:
+            groups.append([[oid], start_point, kwargs])
+    for oids, start_point, kwargs in groups:
+        continue_oids_delayed(oids, start_point, **kwargs)
+
+
+def in_batch():
+    """Return True when called inside :py:func:`.batch`."""
+    return getattr(_batch, "continuations", None) is not None
+
+
+def _check_not_in_batch(func_name):
+    """Raise if a workflow is about to run synchronously in a batch."""
+    if in_batch():
+        from .errors import WorkflowAPIError
+        raise WorkflowAPIError(
+            "{0} cannot run inside batch(), use the delayed "
+            "version instead".format(func_name)
+        )
+
+
+def _get_objects(oids, with_data=False):
+    """Return the objects of the given ids, in one query.
+
+    :raises NoResultFound: when some of the objects do not exist.
+    """
+    from sqlalchemy.orm.exc import NoResultFound
+    from .models import BibWorkflowObject
+
+    oids = set(int(oid) for oid in oids)
+    get = BibWorkflowObject.get_with_data if with_data \
+        else BibWorkflowObject.get
+    objects = get(BibWorkflowObject.id.in_(list(oids))).all()
+    missing = oids.difference(obj.id for obj in objects)
+    if missing:
+        raise NoResultFound("No objects with the ids {0}".format(
+            ", ".join(str(oid) for oid in sorted(missing))))
+    return objects
+
 
 def start(workflow_name, data, **kwargs):
     """Start a workflow by given name for specified data.
@@ -94,6 +184,7 @@ def start(workflow_name, data, **kwargs):
     :return: BibWorkflowEngine that ran the workflow.
     """
     from .worker_engine import run_worker
+    _check_not_in_batch("start")
     if not isinstance(data, list):
         data = [data]
 
@@ -157,6 +248,7 @@ def start_by_wid(wid, **kwargs):
     :return: BibWorkflowEngine that ran the workflow.
     """
     from .worker_engine import restart_worker
+    _check_not_in_batch("start_by_wid")
 
     return restart_worker(wid, **kwargs)
 
@@ -206,7 +298,7 @@ def start_by_oids(workflow_name, oids, **kwargs):
         from .errors import WorkflowAPIError
         raise WorkflowAPIError("No Object IDs are defined")
 
-    objects = BibWorkflowObject.query.filter(
+    objects = BibWorkflowObject.get_with_data(
         BibWorkflowObject.id.in_(list(oids))
     ).all()
     return start(workflow_name, objects, **kwargs)
@@ -267,6 +359,7 @@ def continue_oid(oid, start_point="continue_next", **kwargs):
     :return: BibWorkflowEngine that ran the workflow
     """
     from .worker_engine import continue_worker
+    _check_not_in_batch("continue_oid")
     return continue_worker(oid, start_point, **kwargs)
 
 
@@ -283,6 +376,9 @@ def continue_oid_delayed(oid, start_point="continue_next", **kwargs):
     holds a reference to the workflow id via the function
     `AsynchronousResultWrapper.get`.
 
+    Inside :py:func:`.batch`, the continuation is submitted at the end of
+    the batch and None is returned.
+
     :param oid: id of BibWorkflowObject to run.
     :type oid: str
 
@@ -294,9 +390,83 @@ def continue_oid_delayed(oid, start_point="continue_next", **kwargs):
 
     :return: AsynchronousResultWrapper.
     """
+    if in_batch():
+        _batch.continuations.append((oid, start_point, kwargs))
+        return None
     return WORKER().continue_worker(oid, start_point, **kwargs)
 
 
+def continue_oids_delayed(oids, start_point="continue_next", **kwargs):
+    """Continue workflows for given object ids, asynchronously.
+
+    Similar behavior as :py:func:`.continue_oid_delayed`, except that
+    workers able to do so submit all the continuations at once, e.g. as
+    one Celery group.
+
+    :param oids: list of BibWorkflowObject id's to run.
+    :type oids: list
+
+    :param start_point: where should the workflow start from? See
+        :py:func:`.continue_oid_delayed`.
+    :type start_point: str
+
+    :return: list of AsynchronousResultWrapper.
+    """
+    worker = WORKER()
+    if hasattr(worker, "continue_workers"):
+        return worker.continue_workers(list(oids), start_point, **kwargs)
+    return [worker.continue_worker(oid, start_point, **kwargs)
+            for oid in oids]
+
+
+def resolve_actions(oids):
+    """Resolve the actions of the given objects in one batch.
+
+    Objects are loaded in one query and the ``resolve`` function of their
+    action is called inside :py:func:`.batch`. Objects without action are
+    skipped.
+
+    :param oids: list of BibWorkflowObject id's.
+    :type oids: list
+
+    :return: list of the values returned by the actions.
+    :raises NoResultFound: when some of the objects do not exist, before
+        any action is resolved.
+    """
+    from .registry import actions
+
+    results = []
+    if not oids:
+        return results
+    with batch():
+        for obj in _get_objects(oids, with_data=True):
+            action_name = obj.get_action()
+            if action_name:
+                results.append(actions[action_name]().resolve(obj))
+    return results
+
+
+def delete_objects(oids):
+    """Delete the given objects in one batch.
+
+    :param oids: list of BibWorkflowObject id's.
+    :type oids: list
+
+    :return: number of deleted objects.
+    :raises NoResultFound: when some of the objects do not exist, before
+        any object is deleted.
+    """
+    from .models import BibWorkflowObject
+
+    if not oids:
+        return 0
+    with batch():
+        objects = _get_objects(oids)
+        for obj in objects:
+            BibWorkflowObject.delete(obj)
+    return len(objects)
+
+
 def resume_objects_in_workflow(id_workflow, start_point="continue_next",
                                **kwargs):
     """
@@ -320,6 +490,8 @@ def resume_objects_in_workflow(id_workflow, start_point="continue_next",
     :type start_point: str
 
     yield: BibWorkflowEngine that ran the workflow
+
+    See :py:func:`.resume_objects` to resume many objects.
     """
     from .models import ObjectVersion, BibWorkflowObject
 
@@ -331,3 +503,128 @@ def resume_objects_in_workflow(id_workflow, start_point="continue_next",
     for obj in objects:
         yield continue_oid(oid=obj.id, start_point=start_point,
                            **kwargs)
+
+
+def resume_objects(id_workflow, start_point="continue_next", workers=None,
+                   **kwargs):
+    """Resume the halted objects of a workflow, possibly in threads.
+
+    The objects are continued by chunks, each chunk with a single engine
+    (see :py:func:`.worker_engine.continue_objects_worker`). With workers,
+    the chunks are continued in a pool of threads, each one with its own
+    application context and database session.
+
+    With workers, the engine is created and saved once, before the threads
+    start. The engines of the threads still save the workflow when they
+    start and finish an object: its status, modification date and extra
+    data are then the ones of the last engine saved, while its counters are
+    incremented in SQL and stay right. Extra data set by tasks of
+    concurrent objects can thus be overwritten.
+
+    An error of an object is saved on it and does not stop the other
+    objects, e.g. to unblock many objects after an outage:
+
+    .. code-block:: python
+
+        for oid, version in resume_objects(wid, workers=4):
+            if version == ObjectVersion.ERROR:
+                print "Object {0} failed".format(oid)
+
+    :param id_workflow: id of Workflow with objects to resume.
+    :type id_workflow: str
+
+    :param start_point: where should the workflow start from? See
+        :py:func:`.resume_objects_in_workflow`.
+    :type start_point: str
+
+    :param workers: number of threads, defaults to
+        ``WORKFLOWS_RESUME_WORKERS``. ``0`` resumes the objects in the
+        calling thread.
+    :type workers: int
+
+    :return: generator of (object id, version of the resumed object), in
+        the order objects are resumed. When the generator is closed early,
+        the chunks of objects being resumed in the threads are finished
+        before it returns, but their outcomes are not given. The other
+        objects stay halted.
+    """
+    from flask import current_app
+    from multiprocessing.pool import ThreadPool
+    from threading import Event
+    from .engine import BibWorkflowEngine
+    from .models import ObjectVersion, BibWorkflowObject, Workflow
+    from .utils import with_app_context
+    from .worker_engine import continue_objects_worker
+
+    if workers is None:
+        workers = cfg.get("WORKFLOWS_RESUME_WORKERS", 0)
+    oids = [oid for oid, in BibWorkflowObject.query.with_entities(
+        BibWorkflowObject.id
+    ).filter(
+        BibWorkflowObject.id_workflow == id_workflow,
+        BibWorkflowObject.version == ObjectVersion.HALTED
+    ).order_by(BibWorkflowObject.id)]
+
+    if not workers:
+        for outcome in continue_objects_worker(id_workflow, oids,
+                                               start_point, **kwargs):
+            yield outcome
+        return
+
+    # Saved once here rather than concurrently by each chunk
+    workflow = Workflow.query.get(id_workflow)
+    BibWorkflowEngine(workflow.name, workflow_object=workflow,
+                      **kwargs).save()
+    stopped = Event()
+
+    def resume_chunk(chunk):
+        if stopped.is_set():
+            return []
+        return list(continue_objects_worker(id_workflow, chunk,
+                                            start_point, save_engine=False,
+                                            **kwargs))
+
+    resume_chunk = with_app_context(current_app._get_current_object(),
+                                    resume_chunk)
+    # Small chunks keep the threads busy and stream outcomes regularly
+    chunk_size = max(1, min(100, len(oids) // workers))
+    pool = ThreadPool(workers)
+    try:
+        for outcomes in pool.imap_unordered(
+                resume_chunk, [oids[start:start + chunk_size]
+                               for start in range(0, len(oids), chunk_size)]):
+            for outcome in outcomes:
+                yield outcome
+    finally:
+        # Chunks not started yet are skipped, running ones are finished
+        stopped.set()
+        pool.close()
+        pool.join()
+
+
+def resume_objects_delayed(id_workflow, start_point="continue_next",
+                           **kwargs):
+    """Resume the halted objects of a workflow, asynchronously.
+
+    The continuations are submitted at once with
+    :py:func:`.continue_oids_delayed`, e.g. as one Celery group.
+
+    :param id_workflow: id of Workflow with objects to resume.
+    :type id_workflow: str
+
+    :param start_point: where should the workflow start from? See
+        :py:func:`.resume_objects_in_workflow`.
+    :type start_point: str
+
+    :return: list of (object id, AsynchronousResultWrapper).
+    """
+    from .models import ObjectVersion, BibWorkflowObject
+
+    oids = [oid for oid, in BibWorkflowObject.query.with_entities(
+        BibWorkflowObject.id
+    ).filter(
+        BibWorkflowObject.id_workflow == id_workflow,
+        BibWorkflowObject.version == ObjectVersion.HALTED
+    ).order_by(BibWorkflowObject.id)]
+    return list(zip(oids, continue_oids_delayed(oids, start_point,
+                                                **kwargs)))
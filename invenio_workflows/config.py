@@ -22,9 +22,119 @@
 WORKFLOWS_HOLDING_PEN_CACHE_TIMEOUT = 2629743  # one month
 """Determines the timeout when caching formatted Holding Pen rows."""
 
+WORKFLOWS_HOLDING_PEN_ROW_WORKERS = 0
+"""Number of threads formatting the Holding Pen rows missing from the cache.
+
+With ``0``, rows are formatted one after the other in the request. The
+workflow definition formatters and actions ``render_mini`` must be
+thread-safe to use threads. Each thread loads the objects it formats in
+its own database session.
+"""
+
+WORKFLOWS_HOLDING_PEN_ROW_TIMEOUT = 5
+"""Seconds to wait for the Holding Pen rows formatted in threads.
+
+Late rows are shown as placeholders and cached once formatted.
+"""
+
+WORKFLOWS_RESUME_WORKERS = 0
+"""Number of threads resuming halted objects.
+
+See :py:func:`.api.resume_objects`. With ``0``, objects are resumed one
+after the other. The tasks of the workflows must be thread-safe to use
+threads.
+"""
+
+WORKFLOWS_MULTIPROCESSING_WORKERS = 0
+"""Number of processes of the ``worker_multiprocessing`` worker.
+
+With ``0``, there is one process per CPU.
+"""
+
 WORKFLOWS_HOLDING_PEN_DEFAULT_OUTPUT_FORMAT = "hd"
 """The default timeout when formatting Holding Pen detailed pages."""
 
+WORKFLOWS_HOLDING_PEN_PROJECTION = True
+"""Store the Holding Pen title, description and sort data of saved objects.
+
+Allows the Holding Pen to sort and search in SQL, at the cost of calling
+the workflow definition formatters for the objects saved at rest. They are
+called after the objects are committed, once the engine has processed them.
+Run ``workflows update_projections`` after enabling it on existing objects.
+
+The Holding Pen counters are maintained along; schedule the Celery task
+``invenio_workflows.workers.worker_celery.reconcile_counters`` (or run
+``workflows reconcile_counters``) to fix objects deleted in bulk.
+"""
+
+WORKFLOWS_OBJECT_SERIALIZER = "pickle"
+"""Serializer used to store data and extra data of workflows and objects.
+
+One of the serializers registered in :py:mod:`.serializers`: ``pickle``,
+``msgpack``, ``json`` or ``base64_pickle`` (format of older versions).
+Workflow definitions can override it with a ``serializer`` attribute.
+"""
+
+WORKFLOWS_OBJECT_COMPRESSION = None
+"""Compression applied on serialized data, ``zlib``, ``lz4`` or None.
+
+Workflow definitions can override it with a ``compression`` attribute.
+"""
+
+WORKFLOWS_BULK_INGESTION_CHUNK_SIZE = 1000
+"""Number of data objects created at once when starting a workflow.
+
+Objects and their initial snapshots are then inserted and committed per
+chunk instead of one by one. Set to 0 to disable bulk creation.
+"""
+
+WORKFLOWS_COMMIT_POLICY = None
+"""When the workflow engine commits the objects it processes.
+
+None commits every save of an object, i.e. at least twice per object.
+Otherwise a dict of :py:class:`.engine.CommitPolicy` arguments, e.g.
+``{"objects": 100}`` or ``{"seconds": 5}``. An empty dict commits at the
+end of the run only. Objects processed before a halt or an error are
+always committed.
+"""
+
+WORKFLOWS_VERIFY_COMPLETION = False
+"""Check that workflows are completed by counting their objects.
+
+By default the counters kept on the workflow are trusted, which takes
+constant time. They are incremented in SQL, so engines running objects of
+the same workflow concurrently keep them right. The query is useful to
+check counters that went wrong, e.g. after objects were modified outside
+of the engine.
+"""
+
+WORKFLOWS_LOG_DB_LEVEL = "INFO"
+"""Lowest level of the log records of workflows and objects kept in database.
+
+Use ``WARNING`` in production to keep the logging tables small.
+"""
+
+WORKFLOWS_LOG_STREAM_LEVEL = "DEBUG"
+"""Lowest level of the log records of workflows and objects printed out."""
+
+WORKFLOWS_LOGGER_CACHE_SIZE = 1000
+"""Number of loggers of workflows and objects kept for reuse."""
+
+WORKFLOWS_LOG_BUFFER_SIZE = 1000
+"""Number of log records of a workflow or object kept before being written.
+
+Records are kept per thread and written with the next commit of the
+database session of the thread. Set to 0 to insert every record right
+away, in the transaction of the session.
+"""
+
+WORKFLOWS_LOG_BUFFER_POLICY = "block"
+"""What to do with new log records when the buffer is full.
+
+``block`` inserts the buffered records right away, in the transaction of
+the session, ``drop`` discards the new records.
+"""
+
 WORKFLOWS_DATA_PROCESSORS = {
     'json': 'json.load',
     'marcxml': 'invenio_workflows.manage:split_marcxml',
@@ -37,6 +37,12 @@ class WorkflowBase(object):
     this class.
     """
 
+    serializer = None
+    """Serializer of the object data, see :py:mod:`.serializers`."""
+
+    compression = None
+    """Compression of the object data, see :py:mod:`.serializers`."""
+
     @staticmethod
     def get_title(bwo, **kwargs):
         """Return the value to put in the title column of HoldingPen."""
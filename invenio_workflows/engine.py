@@ -21,17 +21,21 @@
 
 from __future__ import absolute_import
 
-import base64
 import sys
+import time
 import traceback
 
 from uuid import uuid1 as new_uuid
 
+from invenio_base.globals import cfg
+
 from invenio_ext.sqlalchemy import db
 
-from six import iteritems, reraise, text_type
+from six import iteritems, reraise
 from six.moves import cPickle
 
+from sqlalchemy.sql.expression import ClauseElement
+
 from workflow.engine import (
     ContinueNextToken,
     GenericWorkflowEngine,
@@ -42,6 +46,7 @@ from workflow.engine import (
     WorkflowError
 )
 
+from . import serializers
 from .errors import (
     AbortProcessing,
     SkipToken,
@@ -49,16 +54,17 @@ from .errors import (
     WorkflowError as WorkflowErrorClient,
     WorkflowHalt,
 )
-from .logger import BibWorkflowLogHandler, get_logger
+from .logger import get_shared_logger
 from .models import (
     BibWorkflowEngineLog,
     BibWorkflowObject,
     ObjectVersion,
     Workflow,
+    deferred_projections,
 )
 from .signals import (workflow_finished,
                       workflow_started)
-from .utils import dictproperty, get_task_history
+from .utils import ExtraDataProxy, get_task_history
 
 
 class WorkflowStatus(object):
@@ -68,6 +74,42 @@ class WorkflowStatus(object):
     NEW, RUNNING, HALTED, ERROR, COMPLETED = range(5)
 
 
+class CommitPolicy(object):
+
+    """Decide when the objects processed by an engine are committed.
+
+    :param objects: commit once this many objects were processed.
+    :type objects: int
+
+    :param seconds: commit once this many seconds passed since the last
+        commit.
+    :type seconds: float
+
+    Without any of them, objects are committed at the end of the run when
+    the workflow itself is saved.
+    """
+
+    def __init__(self, objects=None, seconds=None):
+        """Initialize the policy."""
+        self.objects = objects
+        self.seconds = seconds
+        self.reset()
+
+    def reset(self):
+        """Start counting again after a commit."""
+        self.pending = 0
+        self.last_commit = time.time()
+
+    def processed(self):
+        """Count a processed object and return True if a commit is due."""
+        self.pending += 1
+        if self.objects and self.pending >= self.objects:
+            return True
+        if self.seconds and time.time() - self.last_commit >= self.seconds:
+            return True
+        return False
+
+
 class BibWorkflowEngine(GenericWorkflowEngine):
 
     """GenericWorkflowEngine with DB persistence for py:mod:`invenio.workflows`.
@@ -129,45 +171,98 @@ class BibWorkflowEngine(GenericWorkflowEngine):
                                        module_name=module_name, uuid=uuid)
                 self.save(status=WorkflowStatus.NEW)
 
-        if text_type(self.db_obj.uuid) not in self.log.name:
-            db_handler_obj = BibWorkflowLogHandler(BibWorkflowEngineLog,
-                                                   "uuid")
-            self.log = get_logger(logger_name="workflow.%s" % self.db_obj.uuid,
-                                  db_handler_obj=db_handler_obj,
-                                  obj=self)
+        self.log = get_shared_logger("invenio_workflows.workflow",
+                                     BibWorkflowEngineLog, "uuid", self)
 
         self.set_workflow_by_name(self.db_obj.name)
         self.set_extra_data_params(**kwargs)
 
+        policy = cfg.get("WORKFLOWS_COMMIT_POLICY")
+        if policy is not None:
+            self.commit_policy = CommitPolicy(**policy)
+
+    _extra_data_proxy = None
+
+    commit_policy = None
+    """:py:class:`CommitPolicy` of the engine, None to commit every save."""
+
+    _counted_objects = None
+
+    _count_all_objects = False
+
+    _counter_deltas = None
+
+    _extra_data_source = None
+
     def get_extra_data(self):
         """Main method to retrieve data saved to the object."""
-        return cPickle.loads(base64.b64decode(self.db_obj._extra_data))
+        if self._get_extra_data_proxy() is not None:
+            return self._extra_data_proxy.data
+        return self.db_obj.load_column("_extra_data")
 
     def set_extra_data(self, value):
         """Main method to update data saved to the object."""
-        self.db_obj._extra_data = base64.b64encode(cPickle.dumps(value))
+        self.db_obj.store_column("_extra_data", value)
+        if self._get_extra_data_proxy() is not None:
+            self._extra_data_proxy.data = value
+            self._extra_data_proxy.modified = False
+            self._extra_data_source = self.db_obj._extra_data
+
+    def _get_extra_data_proxy(self):
+        """Return the proxy of ``extra_data`` if it is still up to date.
+
+        The proxy is dropped when the extra data of the workflow changed
+        without it, e.g. with :py:meth:`.models.Workflow.set_extra_data`
+        or when the workflow is loaded again with other values. Such
+        changes are kept, the pending modifications of the proxy are lost.
+        """
+        proxy = self._extra_data_proxy
+        if proxy is None:
+            return None
+        working_state = self.db_obj._working_state
+        entry = None if working_state is None else \
+            working_state.get("_extra_data")
+        if entry is not None:
+            current = entry[0] is proxy.data
+        else:
+            current = self.db_obj._extra_data == self._extra_data_source
+            if current and working_state is not None:
+                # The working state was enabled after the proxy was made
+                working_state["_extra_data"] = [proxy.data, False]
+        if not current:
+            self._extra_data_proxy = self._extra_data_source = None
+        return self._extra_data_proxy
 
     def reset_extra_data(self):
         """Reset extra data to defaults."""
         from .models import get_default_extra_data
-        self.db_obj._extra_data = get_default_extra_data()
-
-    def extra_data_get(self, key):
-        """Get a key value in extra data."""
-        if key not in self.db_obj.get_extra_data():
-            raise KeyError("%s not in extra_data" % (key,))
-        return self.db_obj.get_extra_data()[key]
-
-    def extra_data_set(self, key, value):
-        """Add a key value pair in extra_data."""
-        tmp = self.db_obj.get_extra_data()
-        tmp[key] = value
-        self.db_obj.set_extra_data(tmp)
+        self.set_extra_data(serializers.loads(get_default_extra_data()))
 
-    extra_data = dictproperty(fget=extra_data_get, fset=extra_data_set,
-                              doc="Sets up property")
+    @property
+    def extra_data(self):
+        """Extra data of the workflow, decoded once.
 
-    del extra_data_get, extra_data_set
+        Key accesses neither query the database nor decode the data,
+        modifications are stored on the workflow when the engine is saved.
+        """
+        if self._get_extra_data_proxy() is None:
+            self._extra_data_proxy = ExtraDataProxy(self.get_extra_data())
+            self._extra_data_source = self.db_obj._extra_data
+        return self._extra_data_proxy
+
+    @extra_data.setter
+    def extra_data(self, value):
+        """Replace the extra data of the workflow."""
+        self.set_extra_data(dict(value))
+
+    def flush_extra_data(self):
+        """Store the modifications made through ``extra_data``."""
+        if self._get_extra_data_proxy() is not None and \
+                self._extra_data_proxy.modified:
+            self.db_obj.store_column("_extra_data",
+                                     self._extra_data_proxy.data)
+            self._extra_data_proxy.modified = False
+            self._extra_data_source = self.db_obj._extra_data
 
     @property
     def counter_object(self):
@@ -205,12 +300,34 @@ class BibWorkflowEngine(GenericWorkflowEngine):
         return self.db_obj.objects
 
     def objects_of_statuses(self, statuses):
-        """Get objects having given statuses."""
-        results = []
-        for obj in self.db_obj.objects:
-            if obj.version in statuses:
-                results.append(obj)
-        return results
+        """Get objects having given statuses.
+
+        The objects are filtered in SQL and their data is loaded only when
+        accessed.
+        """
+        return BibWorkflowObject.get(
+            BibWorkflowObject.id_workflow == self.uuid,
+            BibWorkflowObject.version.in_(statuses)
+        ).order_by(BibWorkflowObject.id).all()
+
+    def count_objects_of_statuses(self, statuses):
+        """Count objects having given statuses without loading them."""
+        return db.session.query(db.func.count(BibWorkflowObject.id)).filter(
+            BibWorkflowObject.id_workflow == self.uuid,
+            BibWorkflowObject.version.in_(statuses)
+        ).scalar()
+
+    def get_object_counts(self):
+        """Return the number of objects of each version, in one query.
+
+        :return: dict of version: count, versions without objects are
+            missing.
+        """
+        return dict(db.session.query(
+            BibWorkflowObject.version, db.func.count(BibWorkflowObject.id)
+        ).filter(
+            BibWorkflowObject.id_workflow == self.uuid
+        ).group_by(BibWorkflowObject.version))
 
     @property
     def completed_objects(self):
@@ -262,12 +379,9 @@ class BibWorkflowEngine(GenericWorkflowEngine):
                                       "inconsistent state, "
                                       "too few objects")
 
-        db_handler_obj = BibWorkflowLogHandler(BibWorkflowEngineLog, "uuid")
-        state['log'] = get_logger(logger_name="workflow.%s" % state['uuid'],
-                                  db_handler_obj=db_handler_obj,
-                                  obj=self)
-
         self.__dict__ = state
+        self.log = get_shared_logger("invenio_workflows.workflow",
+                                     BibWorkflowEngineLog, "uuid", self)
 
     def __repr__(self):
         """Allow to represent the BibWorkflowEngine."""
@@ -285,8 +399,12 @@ BibWorkflowEngine
     @staticmethod
     def before_processing(objects, self):
         """Executed before processing the workflow."""
+        # Extra data stays decoded until the run ends, see save().
+        self.db_obj.enable_working_state()
+        if self.commit_policy is not None:
+            self.commit_policy.reset()
         self.save(status=WorkflowStatus.RUNNING)
-        self.set_counter_initial(len(objects))
+        self.count_new_objects(objects)
         workflow_started.send(self)
         GenericWorkflowEngine.before_processing(objects, self)
 
@@ -300,22 +418,64 @@ BibWorkflowEngine
         else:
             self.save(WorkflowStatus.HALTED)
 
-    def has_completed(self):
-        """Return True if workflow is fully completed."""
-        res = db.session.query(db.func.count(BibWorkflowObject.id)).\
-            filter(BibWorkflowObject.id_workflow == self.uuid).\
-            filter(BibWorkflowObject.version.in_(
-                [ObjectVersion.INITIAL,
-                 ObjectVersion.COMPLETED]
-            )).group_by(BibWorkflowObject.version).all()
-        return len(res) == 2 and res[0] == res[1]
+    def has_completed(self, verify=None):
+        """Return True if workflow is fully completed.
+
+        All the objects counted in the workflow must be finished, see
+        :py:meth:`count_new_objects`.
+
+        :param verify: count the objects in the database instead of
+            trusting the counters, defaults to ``WORKFLOWS_VERIFY_COMPLETION``.
+        :type verify: bool
+        """
+        if verify is None:
+            verify = cfg.get("WORKFLOWS_VERIFY_COMPLETION", False)
+        if not verify:
+            # Read the counters updated by all the engines of the workflow
+            if self._counter_deltas:
+                db.session.flush()
+            return 0 < self.db_obj.counter_initial == \
+                self.db_obj.counter_finished
+
+        counts = self.get_object_counts()
+        return 0 < counts.get(ObjectVersion.INITIAL, 0) == \
+            counts.get(ObjectVersion.COMPLETED, 0)
 
     def save(self, status=None):
         """Save the workflow instance to database."""
         # This workflow continues a previous execution.
         if status == WorkflowStatus.HALTED:
             self.db_obj.current_object = 0
+        self.flush_extra_data()
         self.db_obj.save(status)
+        if status in (WorkflowStatus.HALTED, WorkflowStatus.ERROR,
+                      WorkflowStatus.COMPLETED):
+            # The run is over, stop keeping extra data decoded.
+            self.db_obj.disable_working_state()
+            self._extra_data_proxy = self._extra_data_source = None
+
+    def save_object(self, obj, **kwargs):
+        """Save an object being processed, following the commit policy.
+
+        Without commit policy the object is committed right away, otherwise
+        it is only added to the session, see :py:meth:`object_processed`.
+        """
+        if self.commit_policy is None:
+            obj.save(**kwargs)
+        else:
+            obj.stage(**kwargs)
+
+    def object_processed(self):
+        """Commit processed objects when the commit policy says so."""
+        if self.commit_policy is not None and self.commit_policy.processed():
+            self.commit_objects()
+
+    def commit_objects(self):
+        """Commit objects and counters saved since the last commit."""
+        if self.commit_policy is None:
+            return
+        db.session.commit()
+        self.commit_policy.reset()
 
     def set_task_position(self, new_position):
         """Set current task position."""
@@ -326,7 +486,16 @@ BibWorkflowEngine
 
         :param objects: objects to process.
         """
-        super(BibWorkflowEngine, self).process(objects)
+        # Holding Pen projections are computed once all objects are saved
+        with deferred_projections():
+            try:
+                super(BibWorkflowEngine, self).process(objects)
+            finally:
+                # Objects keep their data decoded while they are processed,
+                # make sure the ones left by halts, errors or aborts are
+                # flushed.
+                for obj in objects:
+                    obj.disable_working_state()
 
     def restart(self, obj, task):
         """Restart the workflow engine at given object and task.
@@ -360,8 +529,8 @@ BibWorkflowEngine
         :param task: the task which should be restarted
         :type task: str
         """
-        self.log.debug("Restarting workflow from %s object and %s task" %
-                       (str(obj), str(task),))
+        self.log.debug("Restarting workflow from %s object and %s task",
+                       obj, task)
 
         # set the point from which to start processing
         if obj == 'prev':
@@ -422,9 +591,13 @@ BibWorkflowEngine
         while len(objects) - 1 > i[0] >= -1:
             i[0] += 1
             obj = objects[i[0]]
+            # Decode data once per object instead of once per task, they
+            # are encoded again only when the object is saved.
+            obj.enable_working_state()
             obj.reset_error_message()
-            obj.save(version=ObjectVersion.RUNNING,
-                     id_workflow=self.db_obj.uuid)
+            self.uncount_object(obj)
+            self.save_object(obj, version=ObjectVersion.RUNNING,
+                             id_workflow=self.db_obj.uuid)
             callbacks = self.callback_chooser(obj, self)
             if callbacks:
                 try:
@@ -432,6 +605,8 @@ BibWorkflowEngine
                 except SkipToken:
                     msg = "Skipped running this object: {0}".format(obj.id)
                     self.log.debug(msg)
+                    obj.disable_working_state()
+                    self.object_processed()
                     continue
                 except AbortProcessing:
                     msg = "Processing was aborted for object: {0}".format(obj.id)
@@ -442,14 +617,14 @@ BibWorkflowEngine
                     self.log.debug(msg)
 
                     # Processing for the object is stopped!
-                    obj.save(version=ObjectVersion.COMPLETED)
+                    self.save_object(obj, version=ObjectVersion.COMPLETED)
                     self.increase_counter_finished()
                     break
                 except JumpTokenBack as step:
                     if step.args[0] > 0:
                         raise WorkflowError("JumpTokenBack cannot"
                                             " be positive number")
-                    self.log.debug('Warning, we go back [%s] objects' %
+                    self.log.debug('Warning, we go back [%s] objects',
                                    step.args[0])
                     i[0] = max(-1, i[0] - 1 + step.args[0])
                     i[1] = [0]  # reset the callbacks pointer
@@ -457,7 +632,7 @@ BibWorkflowEngine
                     if step.args[0] < 0:
                         raise WorkflowError("JumpTokenForward cannot"
                                             " be negative number")
-                    self.log.debug('We skip [%s] objects' % step.args[0])
+                    self.log.debug('We skip [%s] objects', step.args[0])
                     i[0] = min(len(objects), i[0] - 1 + step.args[0])
                     i[1] = [0]  # reset the callbacks pointer
                 except ContinueNextToken:
@@ -466,8 +641,10 @@ BibWorkflowEngine
                     i[1] = [0]  # reset the callbacks pointer
 
                     # This object is skipped for some reason. So we're done
-                    obj.save(version=ObjectVersion.COMPLETED)
+                    self.save_object(obj, version=ObjectVersion.COMPLETED)
+                    obj.disable_working_state()
                     self.increase_counter_finished()
+                    self.object_processed()
                     continue
                 except (HaltProcessing, WorkflowHalt) as e:
                     self.increase_counter_halted()
@@ -476,6 +653,9 @@ BibWorkflowEngine
                     extra_data = obj.get_extra_data()
                     obj.set_extra_data(extra_data)
 
+                    # Objects processed so far and counters must survive
+                    self.commit_objects()
+
                     if isinstance(e, WorkflowHalt):
                         reraise(*sys.exc_info())
                     else:
@@ -489,6 +669,15 @@ BibWorkflowEngine
 
                     msg = "Error: %r\n%s" % (e, traceback.format_exc())
 
+                    # Objects processed so far and counters must survive,
+                    # unless the error left the session unusable.
+                    try:
+                        self.commit_objects()
+                    except Exception:
+                        db.session.rollback()
+                        self.log.warning("Could not commit objects "
+                                         "processed before the error")
+
                     if isinstance(e, WorkflowErrorClient):
                         reraise(*sys.exc_info())
                     else:
@@ -499,21 +688,26 @@ BibWorkflowEngine
                         )
 
             # We save each object once it is fully run through
-            obj.save(version=ObjectVersion.COMPLETED)
+            self.save_object(obj, version=ObjectVersion.COMPLETED)
+            obj.disable_working_state()
             self.increase_counter_finished()
+            self.object_processed()
             i[1] = [0]  # reset the callbacks pointer
         self.after_processing(objects, self)
 
     def execute_callback(self, callback, obj):
-        """Execute the callback (workflow tasks)."""
+        """Execute the callback (workflow tasks).
+
+        While the object is processed, getting and setting its data only
+        touches the decoded working state, see
+        :py:class:`.models.WorkingStateMixin`.
+        """
         obj.data = obj.get_data()
         obj.extra_data = obj.get_extra_data()
-        self.extra_data = self.get_extra_data()
-        self.log.debug("Executing callback %s" % (repr(callback),))
+        self.log.debug("Executing callback %r", callback)
         try:
             callback(obj, self)
         finally:
-            self.set_extra_data(self.extra_data)
             obj.set_data(obj.data)
             obj.extra_data["_task_counter"] = self._i[1]
             obj.extra_data["_last_task_name"] = callback.func_name
@@ -583,18 +777,81 @@ BibWorkflowEngine
         self.db_obj.counter_halted = 0
         self.db_obj.counter_error = 0
         self.db_obj.counter_finished = 0
+        self._counter_deltas = None
+        self._counted_objects = set()
+        # Every object given afterwards starts again from scratch
+        self._count_all_objects = True
+
+    def count_new_objects(self, objects):
+        """Count the objects new to the workflow.
+
+        New objects are the initial ones and the ones coming from another
+        workflow, or all of them once the counters are reset. Objects given
+        again, e.g. when the engine restarts, are counted once.
+        """
+        if self._counted_objects is None:
+            self._counted_objects = set()
+        for obj in objects:
+            key = obj.id or id(obj)
+            if key in self._counted_objects:
+                continue
+            if self._count_all_objects or \
+                    obj.version == ObjectVersion.INITIAL or \
+                    not self._owns_object(obj):
+                self._counted_objects.add(key)
+                self._add_to_counter("counter_initial", 1)
+
+    def uncount_object(self, obj):
+        """Indicate an object leaves its state to be processed again.
+
+        Only objects counted by previous runs of the workflow are
+        discounted.
+        """
+        if not self._owns_object(obj) or self._count_all_objects and \
+                (obj.id or id(obj)) in self._counted_objects:
+            return
+        if obj.version in (ObjectVersion.HALTED, ObjectVersion.WAITING):
+            self._add_to_counter("counter_halted", -1)
+        elif obj.version == ObjectVersion.ERROR:
+            self._add_to_counter("counter_error", -1)
+        elif obj.version == ObjectVersion.COMPLETED:
+            self._add_to_counter("counter_finished", -1)
+
+    def _owns_object(self, obj):
+        return str(obj.id_workflow) == str(self.uuid)
+
+    def _add_to_counter(self, name, delta):
+        """Add ``delta`` to a counter of the workflow, in SQL.
+
+        The counter is updated with ``counter = counter + delta`` when the
+        workflow is flushed, so that engines running objects of the same
+        workflow concurrently do not lose each other's changes.
+        """
+        state = db.inspect(self.db_obj)
+        if not state.persistent:
+            setattr(self.db_obj, name, (getattr(self.db_obj, name) or 0) +
+                    delta)
+            return
+        if self._counter_deltas is None:
+            self._counter_deltas = {}
+        # Once flushed, the expression is replaced by the value in database
+        if not isinstance(state.dict.get(name), ClauseElement):
+            self._counter_deltas.pop(name, None)
+        total = self._counter_deltas.get(name, 0) + delta
+        self._counter_deltas[name] = total
+        setattr(self.db_obj, name, getattr(Workflow, name) + total)
 
     def increase_counter_halted(self):
         """Indicate we halted the processing of one object."""
-        self.db_obj.counter_halted += 1
+        self._add_to_counter("counter_halted", 1)
 
     def increase_counter_error(self):
         """Indicate we crashed the processing of one object."""
-        self.db_obj.counter_error += 1
+        self._add_to_counter("counter_error", 1)
 
     def increase_counter_finished(self):
         """Indicate we finished the processing of one object."""
-        self.db_obj.counter_finished += 1
+        self._add_to_counter("counter_finished", 1)
 
     def set_workflow_by_name(self, workflow_name):
         """Configure the workflow to run by the name of this one.
@@ -162,6 +162,13 @@ class WorkflowAPIError(Exception):
     pass
 
 
+class WorkflowSerializerError(Exception):
+
+    """Raised when stored data cannot be (de)serialized."""
+
+    pass
+
+
 class SkipToken(Exception):
 
     """Used by workflow engine to skip the current process of an object."""
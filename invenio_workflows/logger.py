@@ -20,65 +20,309 @@
 
 import logging
 
+import weakref
 
-def get_logger(logger_name, db_handler_obj, level=10, **kwargs):
+from collections import OrderedDict
+
+from datetime import datetime
+
+from threading import Lock, local
+
+from invenio_ext.sqlalchemy import db
+
+from sqlalchemy import event
+
+
+def get_level(level):
+    """Return the numeric value of a level given by name or number."""
+    if isinstance(level, int):
+        return level
+    return logging.getLevelName(level.upper())
+
+
+def get_levels():
+    """Return the levels of the database and stream sinks.
+
+    They are taken from ``WORKFLOWS_LOG_DB_LEVEL`` and
+    ``WORKFLOWS_LOG_STREAM_LEVEL``.
+    """
+    from invenio_base.globals import cfg
+
+    return (get_level(cfg.get("WORKFLOWS_LOG_DB_LEVEL", "INFO")),
+            get_level(cfg.get("WORKFLOWS_LOG_STREAM_LEVEL", "DEBUG")))
+
+
+def is_enabled_for(level):
+    """Return True if any sink outputs records of the given level.
+
+    Allows to skip building a message, or even a logger, for nothing.
+    """
+    return level >= min(get_levels())
+
+
+def get_logger(logger_name, db_handler_obj, level=None, **kwargs):
     """
     Initialize and return a Python logger object.
 
     You can specifiy the handlers to output logs in sys.stderr as well as the
     datebase or anything you want.
-    """
-    logging.basicConfig(level=level)
 
-    # Get a basic logger object
+    Each handler gets its own level from the configuration, see
+    :py:func:`get_levels`, unless ``level`` is given for all of them.
+    The logger level is the lowest of them so that records nobody outputs
+    are discarded right away.
+    """
     logger = logging.getLogger(logger_name)
+    configure_logger(logger, db_handler_obj, level)
+
+    # Add any kwargs to extra parameter and return logger
+    wrapped_logger = BibWorkflowLogAdapter(logger, kwargs)
+    return wrapped_logger
+
+
+def configure_logger(logger, db_handler_obj, level=None,
+                     fmt='%(levelname)s %(asctime)s %(name)s    %(message)s'):
+    """Add the database and stream handlers and set their levels.
+
+    Handlers are only added to loggers without handlers, ``db_handler_obj``
+    may be None otherwise.
+    """
+    if level is None:
+        db_level, stream_level = get_levels()
+    else:
+        db_level = stream_level = level
 
     if not logger.handlers:
         # Create formatter and add it to the handlers
-        formatter = logging.Formatter(
-            '%(levelname)s %(asctime)s %(name)s    %(message)s')
+        formatter = logging.Formatter(fmt)
         db_handler_obj.setFormatter(formatter)
-        db_handler_obj.setLevel(level)
         logger.addHandler(db_handler_obj)
         stream_handler = logging.StreamHandler()
         stream_handler.setFormatter(formatter)
-        stream_handler.setLevel(level)
         logger.addHandler(stream_handler)
 
+    for handler in logger.handlers:
+        if isinstance(handler, BibWorkflowLogHandler):
+            handler.setLevel(db_level)
+        else:
+            handler.setLevel(stream_level)
+
     # Let's not propagate to root logger..
     logger.propagate = 0
+    logger.setLevel(min(db_level, stream_level))
 
-    # FIXME: loglevels are simply overwritten somewhere in Celery
-    #        even if Celery is not being "used".
-    #
-    #        This means log.DEBUG is NOT working at the moment!
-    logger.setLevel(level)
 
-    # Add any kwargs to extra parameter and return logger
-    wrapped_logger = BibWorkflowLogAdapter(logger, kwargs)
-    return wrapped_logger
+_adapters = OrderedDict()
+"""Most recently used adapters of :py:func:`get_shared_logger`."""
+
+_adapters_lock = Lock()
+
+
+def get_shared_logger(logger_name, model, id_name, obj):
+    """Return a logger for an object, sharing its logger with similar objects.
+
+    All the objects logged in ``model`` use the same logger and database
+    handler, the id of the object is given to the handler with each record.
+    Unlike one logger per object, this does not grow the registry of
+    loggers, which is never emptied.
+
+    Adapters of objects with an id are kept in a LRU cache of
+    ``WORKFLOWS_LOGGER_CACHE_SIZE`` entries, they only hold the id of the
+    object. Objects without id yet get an adapter reading the id at each
+    record.
+
+    :param logger_name: name of the logger shared by the objects.
+    :param model: model storing the log records of the objects.
+    :param id_name: name of the attribute holding the id of the object.
+    :param obj: object to log for.
+    """
+    from invenio_base.globals import cfg
+
+    logger = logging.getLogger(logger_name)
+    configure_logger(
+        logger,
+        None if logger.handlers else BibWorkflowLogHandler(model, id_name),
+        fmt='%(levelname)s %(asctime)s %(name)s.%(id_object)s    %(message)s'
+    )
+
+    id_object = getattr(obj, id_name)
+    if id_object is None:
+        return BibWorkflowLogAdapter(logger, {"obj": obj}, id_name)
+
+    key = (logger_name, id_object)
+    cache_size = cfg.get("WORKFLOWS_LOGGER_CACHE_SIZE", 1000)
+    # Objects are logged from several threads, e.g. see api.resume_objects
+    with _adapters_lock:
+        adapter = _adapters.pop(key, None)
+        if adapter is None:
+            adapter = BibWorkflowLogAdapter(logger, {"id_object": id_object})
+        _adapters[key] = adapter
+        while len(_adapters) > cache_size:
+            _adapters.popitem(last=False)
+    return adapter
+
+
+class _RecordBuffer(list):
+
+    """Log records buffered by a thread, see :py:class:`BibWorkflowLogHandler`.
+
+    A list which can be referenced weakly.
+    """
 
 
 class BibWorkflowLogHandler(logging.Handler, object):
 
-    """Implements a handler for logging to database."""
+    """Implements a buffered handler for logging to database.
 
-    def __init__(self, model, id_name):
+    Records are kept in a bounded buffer per thread, hence per database
+    session, and inserted in bulk with the next commit of this session, so
+    logging never commits the session of the caller by itself. When the
+    buffer is full, records are either dropped or inserted right away in
+    the transaction of the session, see ``WORKFLOWS_LOG_BUFFER_POLICY``.
+    Either way they are committed with the objects they refer to. Records
+    are inserted in a savepoint, records that cannot be inserted are
+    reported with :py:meth:`handleError` without aborting the transaction
+    of the session. Remaining records are written by
+    :py:func:`logging.shutdown`, in a transaction of their own.
+    """
+
+    def __init__(self, model, id_name, capacity=None, policy=None):
         """Instanciate a BibWorkflowLogHandler object."""
+        from invenio_base.globals import cfg
+
         super(BibWorkflowLogHandler, self).__init__()
 
         self.model = model
         self.id_name = id_name
+        if capacity is None:
+            capacity = cfg.get("WORKFLOWS_LOG_BUFFER_SIZE", 1000)
+        self.capacity = capacity
+        self.policy = policy or cfg.get("WORKFLOWS_LOG_BUFFER_POLICY",
+                                        "block")
+        self.local = local()
+        # Buffers of the living threads, for close()
+        self.buffers = weakref.WeakSet()
+        self.dropped = 0
+        self.bind = None
+        _handlers.add(self)
+
+    def get_buffer(self):
+        """Return the records buffered by the current thread."""
+        records = getattr(self.local, "records", None)
+        if records is None:
+            records = self.local.records = _RecordBuffer()
+            self.buffers.add(records)
+        return records
+
+    def pop_records(self, records=None):
+        """Empty a buffer and return its records.
+
+        :param records: buffer to empty, the one of the current thread by
+            default.
+        """
+        if records is None:
+            records = self.get_buffer()
+        popped = records[:]
+        del records[:]
+        return popped
 
     def emit(self, record):
-        """Create the log object in database."""
-        from invenio_ext.sqlalchemy import db
+        """Buffer the log record until the next commit."""
+        if self.bind is None:
+            # Keep the engine to be able to flush on shutdown.
+            self.bind = db.engine
+        id_object = getattr(record, "id_object", None)
+        if id_object is None:
+            id_object = getattr(record.obj, self.id_name)
+        row = {
+            "id_object": id_object,
+            "log_type": record.levelno,
+            "message": record.getMessage(),
+            "created": datetime.now(),
+        }
+        records = self.get_buffer()
+        if self.capacity and len(records) >= self.capacity:
+            if self.policy == "drop":
+                self.dropped += 1
+                return
+            self.write_in_session()
+        records.append((record, row))
+        if not self.capacity:
+            self.write_in_session()
+
+    def write(self, connection, records):
+        """Insert the given records using the given connection.
+
+        The records are inserted in a savepoint, then one by one in
+        savepoints of their own if it fails, so that only the faulty
+        records are lost and the transaction goes on.
+        """
+        if not records:
+            return
+        table = self.model.__table__
+        try:
+            with connection.begin_nested():
+                connection.execute(table.insert(),
+                                   [row for dummy, row in records])
+        except Exception:
+            for record, row in records:
+                try:
+                    with connection.begin_nested():
+                        connection.execute(table.insert(), row)
+                except Exception:
+                    self.handleError(record)
+
+    def write_in_session(self):
+        """Insert the records of the current thread in its session."""
+        self.acquire()
+        try:
+            self.write(db.session.connection(), self.pop_records())
+        finally:
+            self.release()
+
+    def flush(self):
+        """Insert the records of all threads in a transaction of their own.
+
+        Only used when closing the handler, records are otherwise written
+        in the transaction of the session of their thread.
+        """
+        if self.bind is not None:
+            self.acquire()
+            try:
+                records = []
+                for buffer in list(self.buffers):
+                    records.extend(self.pop_records(buffer))
+                if records:
+                    with self.bind.begin() as connection:
+                        self.write(connection, records)
+            finally:
+                self.release()
+
+    def close(self):
+        """Flush the buffered records before closing."""
+        self.flush()
+        _handlers.discard(self)
+        super(BibWorkflowLogHandler, self).close()
 
-        log_obj = self.model(id_object=getattr(record.obj, self.id_name),
-                             log_type=record.levelno,
-                             message=record.msg)
-        db.session.add(log_obj)
-        db.session.commit()
+
+_handlers = weakref.WeakSet()
+"""Database log handlers which may have buffered records."""
+
+
+@event.listens_for(db.session, "before_commit")
+def write_buffered_records(session):
+    """Insert the records buffered by the thread of the session.
+
+    Records of other threads belong to other sessions, they are written
+    when these commit.
+    """
+    for handler in list(_handlers):
+        if getattr(handler.local, "records", None):
+            handler.acquire()
+            try:
+                handler.write(session.connection(), handler.pop_records())
+            finally:
+                handler.release()
 
 
 class BibWorkflowLogAdapter(logging.LoggerAdapter):
@@ -88,9 +332,22 @@ class BibWorkflowLogAdapter(logging.LoggerAdapter):
 
     This example adapter expects the passed in dict-like object to have a
     'obj' key, whose value in brackets is used during logging.
+
+    When ``id_name`` is given, the current value of this attribute of the
+    object is passed to the handlers as ``id_object``.
     """
 
+    def __init__(self, logger, extra, id_name=None):
+        """Initialize the adapter."""
+        super(BibWorkflowLogAdapter, self).__init__(logger, extra)
+        self.id_name = id_name
+
     def process(self, msg, kwargs):
         """Save kwargs in extra."""
-        kwargs['extra'] = self.extra
+        if self.id_name is None:
+            kwargs['extra'] = self.extra
+        else:
+            kwargs['extra'] = dict(
+                self.extra, id_object=getattr(self.extra["obj"], self.id_name)
+            )
         return msg, kwargs
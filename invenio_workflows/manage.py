@@ -78,6 +78,117 @@ def list(verbose=False):
             print(workflow)
 
 
+def _sample_record(index=0):
+    """Return a MARC-like record of realistic size for benchmarks."""
+    abstract = " ".join(["We present the measurement of the cross section "
+                         "of the process in proton-proton collisions."] * 12)
+    return {
+        "001": [str(index)],
+        "005": ["20150101120000.0"],
+        "035__": [{"9": "arXiv", "a": "oai:arXiv.org:1501.%05d" % index}],
+        "037__": [{"9": "arXiv", "a": "arXiv:1501.%05d" % index,
+                   "c": "hep-ex"}],
+        "100__": [{"a": "Author, First", "u": "CERN"}],
+        "245__": [{"a": "Measurement of the cross section number %d" % index,
+                   "9": "arXiv"}],
+        "260__": [{"c": "2015"}],
+        "300__": [{"a": "24"}],
+        "520__": [{"9": "arXiv", "a": abstract}],
+        "650_7": [{"2": "arXiv", "a": "Experiment-HEP"},
+                  {"2": "INSPIRE", "a": "Experiment-HEP"}],
+        "700__": [{"a": "Author, Number %d" % author,
+                   "u": ["CERN", "Institute %d" % (author % 20)]}
+                  for author in range(200)],
+        "8564_": [{"u": "http://arxiv.org/pdf/1501.%05d" % index,
+                   "y": "Fulltext"}],
+        "999C5": [{"o": str(reference),
+                   "r": "arXiv:1401.%05d" % reference,
+                   "s": "Phys.Rev.,D%d,%d" % (reference % 90, reference),
+                   "h": "Someone, A. and Other, B."}
+                  for reference in range(60)],
+    }
+
+
+@manager.option('-i', '--input', type=argparse.FileType('r'),
+                default=None, dest='source',
+                help="JSON file with a list of records to use as sample "
+                     "(defaults to a generated MARC-like record).")
+@manager.option('-n', '--number', dest='number', type=int, default=1000,
+                help="Number of encodings and decodings per serializer.")
+def benchmark_serializers(source=None, number=1000):
+    """Compare size and speed of the object data serializers."""
+    import json
+    from .serializers import benchmark
+
+    if source is not None:
+        samples = json.load(source)
+    else:
+        samples = [_sample_record()]
+    sample = samples[0] if len(samples) == 1 else samples
+
+    print('{0:<24}{1:>12}{2:>14}{3:>14}'.format(
+        'serializer', 'size (B)', 'dumps (op/s)', 'loads (op/s)'))
+    for result in benchmark(sample, number=number):
+        print('{name:<24}{size:>12}{dumps:>14.0f}{loads:>14.0f}'.format(
+            **result))
+
+
+@manager.option('-c', '--chunk-size', dest='chunk_size', type=int,
+                default=1000, help="Number of objects per transaction.")
+def update_projections(chunk_size=1000):
+    """Update the Holding Pen columns stored along the objects."""
+    from invenio_ext.sqlalchemy import db
+    from .models import BibWorkflowObject
+
+    last_id = 0
+    total = 0
+    while True:
+        objects = BibWorkflowObject.get_with_data(
+            BibWorkflowObject.id_parent == None,  # noqa E711
+            BibWorkflowObject.id > last_id
+        ).order_by(BibWorkflowObject.id).limit(chunk_size).all()
+        if not objects:
+            break
+        for obj in objects:
+            obj.update_projection()
+        db.session.commit()
+        total += len(objects)
+        last_id = objects[-1].id
+        print('{0} objects updated'.format(total))
+
+
+@manager.option('tags', nargs='*',
+                help="Holding Pen tags, e.g. HALTED or type:record.")
+@manager.option('-o', '--output', type=argparse.FileType('w'),
+                default=sys.stdout, dest='output',
+                help="Output file (defaults to STDOUT).")
+@manager.option('-f', '--format', dest='output_format', default='ndjson',
+                choices=('ndjson', 'csv'), help="Format of the export.")
+@manager.option('--no-data', dest='with_data', action='store_false',
+                help="Do not export the data of the objects.")
+@manager.option('-c', '--chunk-size', dest='chunk_size', type=int,
+                default=1000, help="Number of objects read per query.")
+def export(tags, output, output_format='ndjson', with_data=True,
+           chunk_size=1000):
+    """Export the Holding Pen objects matching the given tags."""
+    from .utils import export_holdingpen
+
+    for line in export_holdingpen(tags or None, output_format, with_data,
+                                  chunk_size):
+        output.write(line)
+
+
+@manager.command
+def reconcile_counters():
+    """Recompute the Holding Pen counters from the stored objects."""
+    from invenio_ext.sqlalchemy import db
+    from .models import BibWorkflowObjectCounter
+
+    BibWorkflowObjectCounter.reconcile()
+    db.session.commit()
+    print('Holding Pen counters recomputed')
+
+
 def main():
     """Run manager."""
     from invenio_base.factory import create_app
@@ -18,16 +18,22 @@
 
 """Models for BibWorkflow Objects."""
 
-import base64
-
 import logging
 
 import os
 
+import re
+
 import tempfile
 
+from contextlib import contextmanager
+
 from datetime import datetime
 
+from functools import wraps
+
+from threading import local
+
 from invenio_base.globals import cfg
 from invenio_base.helpers import unicodifier
 
@@ -36,13 +42,14 @@ from invenio_ext.sqlalchemy import hybrid_property
 
 from invenio_ext.sqlalchemy.utils import session_manager
 
-from six import callable, iteritems
-from six.moves import cPickle
+from six import callable, integer_types, iteritems, text_type
 
-from sqlalchemy import desc
+from sqlalchemy import and_, desc
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import NoResultFound
 
-from .logger import BibWorkflowLogHandler, get_logger
+from . import serializers
+from .logger import get_shared_logger, is_enabled_for
 
 
 class ObjectVersion(object):
@@ -66,14 +73,23 @@ class ObjectVersion(object):
             return None
 
 
-def get_default_data():
-    """Return the base64 representation of the data default value."""
+def get_default_data(workflow_definition=None):
+    """Return the serialized representation of the data default value.
+
+    It is encoded with the configured serializer, see
+    :py:func:`.serializers.get_options`.
+    """
     data_default = {}
-    return base64.b64encode(cPickle.dumps(data_default))
+    return serializers.dumps(data_default,
+                             *serializers.get_options(workflow_definition))
+
 
+def get_default_extra_data(workflow_definition=None):
+    """Return the serialized representation of the extra_data default value.
 
-def get_default_extra_data():
-    """Return the base64 representation of the extra_data default value."""
+    It is encoded with the configured serializer, see
+    :py:func:`.serializers.get_options`.
+    """
     extra_data_default = {"_tasks_results": {},
                           "owner": {},
                           "_task_counter": {},
@@ -84,10 +100,146 @@ def get_default_extra_data():
                           "redis_search": {},
                           "source": "",
                           "_task_history": []}
-    return base64.b64encode(cPickle.dumps(extra_data_default))
+    return serializers.dumps(extra_data_default,
+                             *serializers.get_options(workflow_definition))
+
+
+def batch_session_manager(func):
+    """Like ``session_manager``, but do not commit inside a batch.
+
+    Changes made inside :py:func:`.api.batch` are committed at its end.
+    """
+    committed = session_manager(func)
+
+    @wraps(func)
+    def decorator(*args, **kwargs):
+        from .api import in_batch
+        if in_batch():
+            return func(*args, **kwargs)
+        result = committed(*args, **kwargs)
+        update_pending_projections()
+        return result
+    return decorator
+
+
+_projections = local()
+
+
+def add_pending_projections(oids):
+    """Record objects whose Holding Pen projection must be updated.
+
+    The projections are computed by :py:func:`update_pending_projections`,
+    after the objects are committed.
+    """
+    pending = getattr(_projections, "pending", None)
+    if pending is None:
+        pending = _projections.pending = set()
+    pending.update(oids)
 
 
-class Workflow(db.Model):
+@contextmanager
+def deferred_projections():
+    """Only record the objects saved in the block.
+
+    Pending projections are updated when the outermost block exits,
+    e.g. once the engine has processed all its objects. When the block
+    raises, failures to update them are logged and the error is raised.
+    """
+    _projections.depth = getattr(_projections, "depth", 0) + 1
+    try:
+        yield
+    except Exception:
+        _projections.depth -= 1
+        try:
+            update_pending_projections()
+        except Exception:
+            from flask import current_app
+            current_app.logger.exception(
+                "Could not update the Holding Pen projections")
+        raise
+    else:
+        _projections.depth -= 1
+        update_pending_projections()
+
+
+def update_pending_projections():
+    """Update the projections of the objects saved since the last call.
+
+    The objects are read back from the database by chunks and the
+    projections are committed at once. Nothing is done inside
+    :py:func:`deferred_projections` or :py:func:`.api.batch`.
+    """
+    from .api import in_batch
+
+    pending = getattr(_projections, "pending", None)
+    if not pending or getattr(_projections, "depth", 0) or in_batch():
+        return
+    oids = sorted(pending)
+    pending.clear()
+    counters = {}
+    chunk_size = cfg.get("WORKFLOWS_BULK_INGESTION_CHUNK_SIZE") or 1000
+    for start in range(0, len(oids), chunk_size):
+        for bwo in BibWorkflowObject.get_with_data(
+                BibWorkflowObject.id.in_(oids[start:start + chunk_size]),
+                BibWorkflowObject.id_parent == None,  # noqa E711
+                BibWorkflowObject.version != ObjectVersion.RUNNING
+        ).order_by(BibWorkflowObject.id):
+            bwo.update_projection(counters)
+    BibWorkflowObjectCounter.add_many(counters)
+    db.session.commit()
+
+
+class WorkingStateMixin(object):
+
+    """Keep decoded binary columns in memory between persistence points.
+
+    By default, every read of a binary column decodes it and every write
+    encodes it. Once the working state is enabled, a column is decoded at
+    most once and writes only keep the new value in memory, flagging it as
+    dirty. Dirty values are encoded back to their columns by
+    :py:meth:`flush_working_state`, which is called when the instance is
+    saved, so unchanged values are never encoded again.
+    """
+
+    _working_state = None
+
+    def enable_working_state(self):
+        """Keep decoded data in memory until the working state is disabled."""
+        if self._working_state is None:
+            self._working_state = {}
+
+    def disable_working_state(self):
+        """Flush the decoded data to the columns and stop caching it."""
+        self.flush_working_state()
+        self._working_state = None
+
+    def flush_working_state(self):
+        """Encode the modified decoded data back to their columns."""
+        if self._working_state:
+            for column, entry in iteritems(self._working_state):
+                if entry[1]:
+                    setattr(self, column, self.dumps(entry[0]))
+                    entry[1] = False
+
+    def load_column(self, column):
+        """Return the decoded value of the given binary column."""
+        if self._working_state is None:
+            return serializers.loads(getattr(self, column))
+        if column not in self._working_state:
+            self._working_state[column] = [
+                serializers.loads(getattr(self, column)), False
+            ]
+        return self._working_state[column][0]
+
+    def store_column(self, column, value):
+        """Set the value of the given binary column."""
+        if self._working_state is None:
+            setattr(self, column, self.dumps(value))
+        else:
+            self._working_state[column] = [value, True]
+
+
+class Workflow(db.Model, WorkingStateMixin):
 
     """Represents a workflow instance.
 
@@ -107,7 +259,7 @@ class Workflow(db.Model):
     id_user = db.Column(db.Integer, default=0, nullable=False)
     _extra_data = db.Column(db.LargeBinary,
                             nullable=False,
-                            default=get_default_extra_data())
+                            default=get_default_extra_data)
     status = db.Column(db.Integer, default=0, nullable=False)
     current_object = db.Column(db.Integer, default="0", nullable=False)
     counter_initial = db.Column(db.Integer, default=0, nullable=False)
@@ -201,7 +353,7 @@ class Workflow(db.Model):
         """Return the objects of the workflow."""
         return cls.get(Workflow.uuid == uuid).one().objects
 
-    def get_extra_data(self, user_id=0, uuid=None, key=None, getter=None):
+    def get_extra_data(self, user_id=None, uuid=None, key=None, getter=None):
         """Get the extra_data for the object.
 
         Returns a JSON of the column extra_data or
@@ -210,13 +362,18 @@ class Workflow(db.Model):
 
         You can define either the key or the getter function.
 
+        The data is read from this instance, without querying the database,
+        and is decoded only once while the working state is enabled.
+
+        :param user_id: deprecated, see :py:meth:`_get_legacy_extra_data`.
+        :param uuid: deprecated, see :py:meth:`_get_legacy_extra_data`.
         :param key: the key to access the desirable value
         :param getter: callable that takes a dict as param and returns a value
         """
-        extra_data = Workflow.get(Workflow.id_user == self.id_user,
-                                  Workflow.uuid == self.uuid).one()._extra_data
-
-        extra_data = cPickle.loads(base64.b64decode(extra_data))
+        if user_id is not None or uuid is not None:
+            extra_data = self._get_legacy_extra_data(user_id, uuid)
+        else:
+            extra_data = self.load_column("_extra_data")
         if key:
             return extra_data[key]
         elif callable(getter):
@@ -224,7 +381,7 @@ class Workflow(db.Model):
         elif not key:
             return extra_data
 
-    def set_extra_data(self, user_id=0, uuid=None,
+    def set_extra_data(self, user_id=None, uuid=None,
                        key=None, value=None, setter=None):
         """Replace extra_data.
 
@@ -232,20 +389,65 @@ class Workflow(db.Model):
         if any of the other arguments are defined, a specific value.
         You can define either the key, value or the setter function.
 
+        The change is stored on this instance and persisted with it.
+
+        :param user_id: deprecated, see :py:meth:`_get_legacy_extra_data`.
+        :param uuid: deprecated, see :py:meth:`_get_legacy_extra_data`.
         :param key: the key to access the desirable value
         :param value: the new value
         :param setter: a callable that takes a dict as param and modifies it
         """
-        extra_data = Workflow.get(Workflow.id_user == user_id,
-                                  Workflow.uuid == uuid).one()._extra_data
-        extra_data = cPickle.loads(base64.b64decode(extra_data))
+        legacy = user_id is not None or uuid is not None
+        if legacy:
+            extra_data = self._get_legacy_extra_data(user_id, uuid)
+        else:
+            extra_data = self.load_column("_extra_data")
         if key is not None and value is not None:
             extra_data[key] = value
         elif callable(setter):
             setter(extra_data)
+        if not legacy:
+            self.store_column("_extra_data", extra_data)
+            return
 
+        # Written to the database at once, as before the working state
         Workflow.get(Workflow.uuid == self.uuid).update(
-            {'_extra_data': base64.b64encode(cPickle.dumps(extra_data))}
+            {'_extra_data': self.dumps(extra_data)},
+            synchronize_session=False
+        )
+        if self._working_state:
+            self._working_state.pop("_extra_data", None)
+        if db.inspect(self).persistent:
+            # Reloaded when read again, e.g. by the engine of the workflow
+            db.session.expire(self, ["_extra_data"])
+
+    def _get_legacy_extra_data(self, user_id, uuid):
+        """Return the extra data of the workflow of given user and uuid.
+
+        Passing ``user_id`` or ``uuid`` to :py:meth:`get_extra_data` and
+        :py:meth:`set_extra_data` reads the extra data of that workflow
+        from the database, and :py:meth:`set_extra_data` then writes it to
+        this workflow right away. This behaviour is deprecated.
+        """
+        import warnings
+        warnings.warn("The user_id and uuid arguments of the extra data "
+                      "accessors of Workflow are deprecated, call them on "
+                      "the workflow instance instead.",
+                      DeprecationWarning, stacklevel=3)
+        criteria = [Workflow.uuid == (self.uuid if uuid is None else uuid)]
+        if user_id is not None:
+            criteria.append(Workflow.id_user == user_id)
+        return serializers.loads(Workflow.get(*criteria).one()._extra_data)
+
+    def get_workflow_definition(self):
+        """Return the workflow definition class from the registry, if any."""
+        from .registry import workflows
+        return workflows.get(self.name)
+
+    def dumps(self, value):
+        """Serialize the value with the serializer of this workflow."""
+        return serializers.dumps(
+            value, *serializers.get_options(self.get_workflow_definition())
         )
 
     @classmethod
@@ -255,16 +457,17 @@ class Workflow(db.Model):
         uuid = uuid or cls.uuid
         db.session.delete(cls.get(Workflow.uuid == uuid).first())
 
-    @session_manager
+    @batch_session_manager
     def save(self, status):
         """Save object to persistent storage."""
+        self.flush_working_state()
         self.modified = datetime.now()
         if status is not None:
             self.status = status
         db.session.add(self)
 
 
-class BibWorkflowObject(db.Model):
+class BibWorkflowObject(db.Model, WorkingStateMixin):
 
     """Data model for wrapping data being run in the workflows.
 
@@ -308,16 +511,25 @@ class BibWorkflowObject(db.Model):
     """
 
     __tablename__ = "bwlOBJECT"
+    __table_args__ = (
+        db.Index("ix_bwlOBJECT_id_workflow_version",
+                 "id_workflow", "version"),
+        db.Index("ix_bwlOBJECT_id_parent_version", "id_parent", "version"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
 
     # Our internal data column. Default is encoded dict.
-    _data = db.Column(db.LargeBinary,
-                      nullable=False,
-                      default=get_default_data())
-    _extra_data = db.Column(db.LargeBinary,
-                            nullable=False,
-                            default=get_default_extra_data())
+    # Encoded columns are only loaded when accessed, both at once, see
+    # get_with_data() and load_data().
+    _data = db.deferred(db.Column(db.LargeBinary,
+                                  nullable=False,
+                                  default=get_default_data),
+                        group="data")
+    _extra_data = db.deferred(db.Column(db.LargeBinary,
+                                        nullable=False,
+                                        default=get_default_extra_data),
+                              group="data")
 
     _id_workflow = db.Column(db.String(36),
                              db.ForeignKey('bwlWORKFLOW.uuid'), nullable=True,
@@ -340,12 +552,26 @@ class BibWorkflowObject(db.Model):
                           index=True)
     uri = db.Column(db.String(500), default="")
     id_user = db.Column(db.Integer, default=0, nullable=False)
+    action = db.Column(db.String(150), nullable=True, index=True)
 
     child_logs = db.relationship(
         "BibWorkflowObjectLog",
         backref=db.backref('bibworkflowobject'),
         cascade="all, delete, delete-orphan")
 
+    projection = db.relationship(
+        "BibWorkflowObjectProjection",
+        uselist=False,
+        cascade="all, delete, delete-orphan")
+
+    sort_keys = db.relationship(
+        "BibWorkflowObjectSortKey",
+        cascade="all, delete, delete-orphan")
+
+    terms = db.relationship(
+        "BibWorkflowObjectTerm",
+        cascade="all, delete, delete-orphan")
+
     workflow = db.relationship(
         Workflow,
         backref=db.backref('objects', cascade="all, delete-orphan")
@@ -353,6 +579,8 @@ class BibWorkflowObject(db.Model):
 
     _log = None
 
+    _serializer_options = None
+
     @hybrid_property
     def id_workflow(self):
         """Get id_workflow."""
@@ -362,30 +590,39 @@ class BibWorkflowObject(db.Model):
     def id_workflow(self, value):
         """Set id_workflow."""
         self._id_workflow = str(value) if value else None
+        self._serializer_options = None
 
     @property
     def log(self):
         """Access logger object for this instance."""
         if not self._log:
-            db_handler_obj = BibWorkflowLogHandler(BibWorkflowObjectLog, "id")
-            self._log = get_logger(logger_name="object.%s" %
-                                               (self.id,),
-                                   db_handler_obj=db_handler_obj,
-                                   loglevel=logging.DEBUG,
-                                   obj=self)
+            self._log = get_shared_logger("invenio_workflows.object",
+                                          BibWorkflowObjectLog, "id", self)
         return self._log
 
+    def dumps(self, value):
+        """Serialize the value with the serializer of the object workflow.
+
+        The serializer is looked up once per workflow on the definition
+        and in the configuration, see :py:mod:`.serializers`.
+        """
+        if self._serializer_options is None:
+            from .registry import workflows
+            definition = workflows.get(self.get_workflow_name())
+            self._serializer_options = serializers.get_options(definition)
+        return serializers.dumps(value, *self._serializer_options)
+
     def get_data(self):
         """Get data saved in the object."""
-        return cPickle.loads(base64.b64decode(self._data))
+        return self.load_column("_data")
 
     def set_data(self, value):
         """Save data to the object."""
-        self._data = base64.b64encode(cPickle.dumps(value))
+        self.store_column("_data", value)
 
     def get_extra_data(self):
         """Get extra data saved to the object."""
-        return cPickle.loads(base64.b64decode(self._extra_data))
+        return self.load_column("_extra_data")
 
     def set_extra_data(self, value):
         """Save extra data to the object.
@@ -393,7 +630,9 @@ class BibWorkflowObject(db.Model):
         :param value: what you want to replace extra_data with.
         :type value: dict
         """
-        self._extra_data = base64.b64encode(cPickle.dumps(value))
+        self.store_column("_extra_data", value)
+        if "_action" in value:
+            self.action = value["_action"]
 
     def get_workflow_name(self):
         """Return the workflow name for this object."""
@@ -437,6 +676,8 @@ class BibWorkflowObject(db.Model):
     def __eq__(self, other):
         """Enable equal operators on BibWorkflowObjects."""
         if isinstance(other, BibWorkflowObject):
+            self.flush_working_state()
+            other.flush_working_state()
             if self._data == other._data and \
                     self._extra_data == other._extra_data and \
                     self.id_workflow == other.id_workflow and \
@@ -568,7 +809,7 @@ class BibWorkflowObject(db.Model):
 
         :return: name of action assigned as string, or None
         """
-        return self.get_extra_data().get("_action")
+        return self.action
 
     def get_action_message(self):
         """Retrieve the currently assigned widget, if any."""
@@ -757,6 +998,9 @@ class BibWorkflowObject(db.Model):
 
     def copy(self, other):
         """Copy data and metadata except id and id_workflow."""
+        other.flush_working_state()
+        if self._working_state is not None:
+            self._working_state = {}
         self._data = other._data
         self._extra_data = other._extra_data
         self.version = other.version
@@ -766,19 +1010,30 @@ class BibWorkflowObject(db.Model):
         self.status = other.status
         self.data_type = other.data_type
         self.uri = other.uri
+        self.action = other.action
 
-    @session_manager
+    @batch_session_manager
     def save(self, version=None, task_counter=None, id_workflow=None):
         """Save object to persistent storage."""
+        self.stage(version, task_counter, id_workflow)
+
+    def stage(self, version=None, task_counter=None, id_workflow=None):
+        """Add object to the session without committing it.
+
+        Takes the same parameters as :py:meth:`save`, the object is
+        persisted by the next commit of the session.
+        """
         if task_counter is not None:
             if isinstance(task_counter, list):
-                self.log.debug("Saving task counter: %s" % (task_counter,))
+                if is_enabled_for(logging.DEBUG):
+                    self.log.debug("Saving task counter: %s", task_counter)
                 extra_data = self.get_extra_data()
                 extra_data["_task_counter"] = task_counter
                 self.set_extra_data(extra_data)
             else:
                 raise ValueError("Task counter must be a list!")
 
+        self.flush_working_state()
         if version is not None:
             if version != self.version:
                 self.modified = datetime.now()
@@ -786,8 +1041,25 @@ class BibWorkflowObject(db.Model):
         if id_workflow is not None:
             self.id_workflow = id_workflow
         db.session.add(self)
-        if self.id is not None:
-            self.log.debug("Saving object: %s" % (self.id or "new",))
+        if self.id is not None and is_enabled_for(logging.DEBUG):
+            self.log.debug("Saving object: %s", self.id)
+        if self.id_parent is None and \
+                self.version != ObjectVersion.RUNNING and \
+                cfg.get("WORKFLOWS_HOLDING_PEN_PROJECTION", True):
+            # Computed after the commit, out of the processing transaction
+            if self.id is None:
+                db.session.flush()
+            add_pending_projections([self.id])
+
+    def update_projection(self, counters=None):
+        """Update the Holding Pen columns of the object.
+
+        See :py:class:`BibWorkflowObjectProjection`. Objects saved are
+        updated by :py:func:`update_pending_projections`.
+        """
+        if self.id is None:
+            db.session.flush()
+        BibWorkflowObjectProjection.update(self, counters)
 
     @classmethod
     def get(cls, *criteria, **filters):
@@ -809,18 +1081,63 @@ class BibWorkflowObject(db.Model):
                          user_id=user_id)
 
         See also SQLAlchemy BaseQuery's filter and filter_by documentation.
+
+        The data and extra data of the objects are not fetched, use
+        :py:meth:`get_with_data` for objects which are all decoded.
         """
         return cls.query.filter(*criteria).filter_by(**filters)
 
     @classmethod
-    @session_manager
+    def get_with_data(cls, *criteria, **filters):
+        """Like :py:meth:`get` but fetch the data and extra data too."""
+        return cls.get(*criteria, **filters).options(
+            db.undefer_group("data")
+        )
+
+    @classmethod
+    def load_data(cls, objects):
+        """Fetch the data and extra data of objects in a single query.
+
+        Objects which already have them loaded are left untouched.
+
+        :param objects: list of BibWorkflowObject's, e.g. a Holding Pen page.
+        """
+        ids = [obj.id for obj in objects
+               if obj.id is not None and "_data" in db.inspect(obj).unloaded]
+        if ids:
+            cls.get_with_data(cls.id.in_(ids)).all()
+
+    @classmethod
+    def get_awaiting(cls, action=None, *criteria, **filters):
+        """Return a query of the halted objects waiting for an action.
+
+        .. code-block:: python
+
+            BibWorkflowObject.get_awaiting("approval", id_user=user_id)
+
+        :param action: name of the action, e.g. "approval", or None for
+            any action.
+        :type action: str
+        """
+        if action is None:
+            criteria += (cls.action != None,)  # noqa E711
+        else:
+            criteria += (cls.action == action,)
+        return cls.get(cls.version == ObjectVersion.HALTED,
+                       *criteria, **filters)
+
+    @classmethod
+    @batch_session_manager
     def delete(cls, oid):
         """Delete a BibWorkflowObject."""
-        if isinstance(oid, BibWorkflowObject):
-            db.session.delete(oid)
-        else:
-            db.session.delete(
-                BibWorkflowObject.get(BibWorkflowObject.id == oid).first())
+        if not isinstance(oid, BibWorkflowObject):
+            oid = BibWorkflowObject.get(BibWorkflowObject.id == oid).first()
+        from .utils import delete_formatted_holdingpen_object
+        if oid.projection is not None:
+            BibWorkflowObjectCounter.add(oid.projection.counter_key, -1)
+        if oid.id is not None and oid.modified is not None:
+            delete_formatted_holdingpen_object(oid)
+        db.session.delete(oid)
 
     @classmethod
     @session_manager
@@ -849,6 +1166,311 @@ class BibWorkflowObject(db.Model):
         return obj
 
 
+class BibWorkflowObjectProjection(db.Model):
+
+    """Holding Pen columns of a BibWorkflowObject.
+
+    The title, description and search text given by the workflow
+    definition are stored along the object when it is saved, so that the
+    Holding Pen can sort and search in SQL instead of formatting every
+    object. See also :py:class:`BibWorkflowObjectSortKey` and
+    :py:class:`BibWorkflowObjectTerm`.
+
+    The version, type, action and user the object is counted under in
+    :py:class:`BibWorkflowObjectCounter` are kept as well.
+    """
+
+    __tablename__ = "bwlOBJECTPROJECTION"
+    id_object = db.Column(db.Integer,
+                          db.ForeignKey("bwlOBJECT.id", ondelete="CASCADE"),
+                          primary_key=True)
+    title = db.Column(db.String(255), default="", nullable=False,
+                      index=True)
+    description = db.Column(db.Text, default="", nullable=False)
+    action = db.Column(db.String(150), default="", nullable=False)
+    search_text = db.Column(db.Text, default="", nullable=False)
+    version = db.Column(db.Integer(3), default=ObjectVersion.INITIAL,
+                        nullable=False)
+    data_type = db.Column(db.String(150), default="", nullable=False)
+    id_user = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        """Represent a projection."""
+        return "<BibWorkflowObjectProjection(%s, %r)>" % (self.id_object,
+                                                          self.title)
+
+    @property
+    def counter_key(self):
+        """Return the key of the counter the object is counted in."""
+        return self.version, self.data_type, self.action, self.id_user
+
+    @classmethod
+    def format(cls, bwo):
+        """Return the title, description, additional text and sort data.
+
+        They are given by the workflow definition of the object.
+        """
+        from .definitions import WorkflowBase
+        from .registry import workflows
+
+        workflow_definition = workflows.get(bwo.get_workflow_name())
+        if not hasattr(workflow_definition, "get_description"):
+            workflow_definition = WorkflowBase
+
+        bwo = DecodedObjectView(bwo)
+        return (unicodifier(workflow_definition.get_title(bwo) or ""),
+                unicodifier(workflow_definition.get_description(bwo) or ""),
+                unicodifier(workflow_definition.get_additional(bwo) or ""),
+                workflow_definition.get_sort_data(bwo) or {})
+
+    @classmethod
+    def update(cls, bwo, counters=None):
+        """Compute and store the projection of the given object.
+
+        Failures of the workflow definition are logged and leave the
+        formatted columns empty, database errors are raised.
+
+        :param counters: dict collecting the changes of the counters, see
+            :py:meth:`BibWorkflowObjectCounter.add_many`. By default they
+            are applied at once.
+        """
+        try:
+            title, description, additional, sort_data = cls.format(bwo)
+        except Exception:
+            from flask import current_app
+            current_app.logger.exception(
+                "Could not format the Holding Pen projection of object %s",
+                bwo.id
+            )
+            title, description, additional, sort_data = u"", u"", u"", {}
+
+        search_text = u" ".join(
+            text_type(value) for value in
+            (title, description, additional, bwo.data_type or "")
+        ).lower()
+        projection = bwo.projection
+        if projection is None:
+            old_key = None
+            projection = bwo.projection = cls(id_object=bwo.id)
+        else:
+            old_key = projection.counter_key
+        projection.title = text_type(title)[:255]
+        projection.description = text_type(description)
+        projection.action = (bwo.action or "")[:150]
+        projection.search_text = search_text
+        projection.version = bwo.version
+        projection.data_type = bwo.data_type or ""
+        projection.id_user = bwo.id_user or 0
+        if projection.counter_key != old_key:
+            deltas = {} if counters is None else counters
+            if old_key is not None:
+                deltas[old_key] = deltas.get(old_key, 0) - 1
+            new_key = projection.counter_key
+            deltas[new_key] = deltas.get(new_key, 0) + 1
+            if counters is None:
+                BibWorkflowObjectCounter.add_many(deltas)
+
+        BibWorkflowObjectTerm.query.filter(
+            BibWorkflowObjectTerm.id_object == bwo.id
+        ).delete(synchronize_session=False)
+        terms = BibWorkflowObjectTerm.tokenize(search_text)
+        if terms:
+            db.session.execute(BibWorkflowObjectTerm.__table__.insert(), [
+                {"term": term, "id_object": bwo.id} for term in terms
+            ])
+
+        BibWorkflowObjectSortKey.query.filter(
+            BibWorkflowObjectSortKey.id_object == bwo.id
+        ).delete(synchronize_session=False)
+        # None values are missing ones, see utils.get_sort_data_key
+        db.session.add_all([
+            BibWorkflowObjectSortKey(id_object=bwo.id, key=key, value=value)
+            for key, value in iteritems(sort_data) if value is not None
+        ])
+
+
+class DecodedObjectView(object):
+
+    """Object given to the workflow definitions, with its data decoded.
+
+    Definitions expect ``data`` and ``extra_data`` attributes, as in the
+    Holding Pen. They are set on the view, the object is left untouched.
+    """
+
+    def __init__(self, bwo):
+        """Decode the data of the object."""
+        self._bwo = bwo
+        self.data = bwo.get_data()
+        self.extra_data = bwo.get_extra_data()
+
+    def __getattr__(self, name):
+        """Read the other attributes from the object."""
+        return getattr(self._bwo, name)
+
+
+class BibWorkflowObjectSortKey(db.Model):
+
+    """Value of a ``sort_data`` key of a BibWorkflowObject.
+
+    Numbers are kept apart so that they are sorted as such.
+    """
+
+    __tablename__ = "bwlOBJECTSORTKEY"
+    __table_args__ = (
+        db.Index("ix_bwlOBJECTSORTKEY_key_number_value",
+                 "key", "number", "value"),
+    )
+    id_object = db.Column(db.Integer,
+                          db.ForeignKey("bwlOBJECT.id", ondelete="CASCADE"),
+                          primary_key=True)
+    key = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.String(255), default="", nullable=False)
+    number = db.Column(db.Float, nullable=True)
+
+    def __init__(self, id_object=None, key=None, value=None):
+        """Store the value as text, and as number if it is one."""
+        self.id_object = id_object
+        self.key = key
+        if isinstance(value, (integer_types, float)) and \
+                not isinstance(value, bool):
+            self.number = value
+        self.value = text_type(unicodifier(value) if value is not None
+                               else "")[:255]
+
+    def __repr__(self):
+        """Represent a sort key."""
+        return "<BibWorkflowObjectSortKey(%s, %s=%r)>" % (
+            self.id_object, self.key, self.value)
+
+
+class BibWorkflowObjectTerm(db.Model):
+
+    """Word of the Holding Pen search text of a BibWorkflowObject.
+
+    Inverted index of :py:attr:`BibWorkflowObjectProjection.search_text`:
+    the primary key gives the objects containing a word, or words starting
+    with some text, without scanning the texts.
+    """
+
+    __tablename__ = "bwlOBJECTTERM"
+    term = db.Column(db.String(64), primary_key=True)
+    id_object = db.Column(db.Integer,
+                          db.ForeignKey("bwlOBJECT.id", ondelete="CASCADE"),
+                          primary_key=True, index=True)
+
+    word_re = re.compile(r"\w+", re.UNICODE)
+    tag_re = re.compile(r"<[^>]*>")
+
+    @classmethod
+    def tokenize(cls, text):
+        """Return the set of lowercase words of a text, markup excluded."""
+        return set(word[:64] for word in
+                   cls.word_re.findall(cls.tag_re.sub(u" ", text).lower()))
+
+    def __repr__(self):
+        """Represent a term."""
+        return "<BibWorkflowObjectTerm(%r, %s)>" % (self.term, self.id_object)
+
+
+class BibWorkflowObjectCounter(db.Model):
+
+    """Number of Holding Pen objects per version, type, action and user.
+
+    Counters are updated along :py:class:`BibWorkflowObjectProjection`
+    whenever an object is saved at rest or deleted, so that dashboards
+    read a few rows instead of loading objects. Objects deleted in bulk,
+    e.g. with their workflow, are only discounted by :py:meth:`reconcile`.
+    """
+
+    __tablename__ = "bwlOBJECTCOUNTER"
+    version = db.Column(db.Integer(3), primary_key=True,
+                        autoincrement=False)
+    data_type = db.Column(db.String(150), primary_key=True)
+    action = db.Column(db.String(150), primary_key=True)
+    id_user = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    count = db.Column(db.Integer, default=0, nullable=False)
+
+    def __repr__(self):
+        """Represent a counter."""
+        return "<BibWorkflowObjectCounter(%s, %r, %r, %s: %s)>" % (
+            self.version, self.data_type, self.action, self.id_user,
+            self.count)
+
+    @classmethod
+    def add(cls, key, delta):
+        """Add ``delta`` to the counter of the given key.
+
+        Decrements only update existing counters. Increments insert the
+        missing ones in the same statement on MySQL. On other databases
+        a concurrent insert is retried as an update.
+
+        :param key: tuple of (version, data_type, action, id_user), see
+            :py:attr:`BibWorkflowObjectProjection.counter_key`.
+        """
+        table = cls.__table__
+        values = dict(zip(("version", "data_type", "action", "id_user"), key))
+        connection = db.session.connection()
+        if delta > 0 and connection.dialect.name == "mysql":
+            connection.execute(db.text(
+                "INSERT INTO {0} (version, data_type, action, id_user, count) "
+                "VALUES (:version, :data_type, :action, :id_user, :delta) "
+                "ON DUPLICATE KEY UPDATE count = count + :delta"
+                .format(cls.__tablename__)
+            ), delta=delta, **values)
+            return
+
+        update = table.update().where(and_(*[
+            table.c[column] == value for column, value in iteritems(values)
+        ])).values(count=table.c.count + delta)
+        if connection.execute(update).rowcount or delta <= 0:
+            return
+        try:
+            with db.session.begin_nested():
+                db.session.connection().execute(
+                    table.insert().values(count=delta, **values))
+        except IntegrityError:
+            db.session.connection().execute(update)
+
+    @classmethod
+    def add_many(cls, deltas):
+        """Apply the changes of several counters.
+
+        Counters are updated in the order of their keys, so that
+        concurrent transactions lock them in the same order.
+
+        :param deltas: dict of key to delta, see :py:meth:`add`.
+        """
+        for key in sorted(deltas):
+            if deltas[key]:
+                cls.add(key, deltas[key])
+
+    @classmethod
+    def get_counts(cls, *criteria, **filters):
+        """Return the number of objects per version.
+
+        Counters can be filtered like in :py:meth:`BibWorkflowObject.get`,
+        e.g. ``get_counts(id_user=user_id)``.
+
+        :return: dict of version to number of objects.
+        """
+        query = db.session.query(
+            cls.version, db.func.sum(cls.count)
+        ).filter(*criteria).filter_by(**filters).group_by(cls.version)
+        return dict((version, int(count or 0)) for version, count in query)
+
+    @classmethod
+    def reconcile(cls):
+        """Recompute all counters from the projections of the objects."""
+        projection = BibWorkflowObjectProjection.__table__
+        columns = [projection.c.version, projection.c.data_type,
+                   projection.c.action, projection.c.id_user]
+        db.session.execute(cls.__table__.delete())
+        db.session.execute(cls.__table__.insert().from_select(
+            ["version", "data_type", "action", "id_user", "count"],
+            db.select(columns + [db.func.count()]).group_by(*columns)
+        ))
+
+
 class BibWorkflowObjectLog(db.Model):
 
     """Represents a log entry for BibWorkflowObjects.
@@ -859,6 +1481,10 @@ class BibWorkflowObjectLog(db.Model):
     """
 
     __tablename__ = 'bwlOBJECTLOGGING'
+    __table_args__ = (
+        db.Index("ix_bwlOBJECTLOGGING_id_object_log_type_created",
+                 "id_object", "log_type", "created"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     id_object = db.Column(db.Integer(255),
                           db.ForeignKey('bwlOBJECT.id'),
@@ -922,6 +1548,10 @@ class BibWorkflowEngineLog(db.Model):
     """
 
     __tablename__ = "bwlWORKFLOWLOGGING"
+    __table_args__ = (
+        db.Index("ix_bwlWORKFLOWLOGGING_id_object_log_type_created",
+                 "id_object", "log_type", "created"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     _id_object = db.Column(db.String(36),
                            db.ForeignKey('bwlWORKFLOW.uuid'),
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Serializers for the binary columns of workflows and workflow objects.
+
+Every blob written by this module starts with a small header holding the
+name of the serializer (and optional compression) used to produce it:
+
+.. code-block:: text
+
+    \\x00<serializer>[+<compression>]\\x00<payload>
+
+Blobs without header are considered to be written by older versions of
+the module, i.e. ``base64.b64encode(cPickle.dumps(value))``, and are still
+decoded transparently.
+
+The serializer to use is taken from the workflow definition attributes
+``serializer`` and ``compression`` if present, otherwise from the
+configuration variables ``WORKFLOWS_OBJECT_SERIALIZER`` and
+``WORKFLOWS_OBJECT_COMPRESSION``.
+"""
+
+import base64
+
+import json
+
+import time
+
+import zlib
+
+import msgpack
+
+from six.moves import cPickle
+
+from .errors import WorkflowSerializerError
+
+try:
+    from lz4 import block as lz4
+except ImportError:
+    try:
+        import lz4
+    except ImportError:
+        lz4 = None
+
+
+HEADER = b"\x00"
+"""Marks the beginning and end of the serializer tag in a blob."""
+
+LEGACY_SERIALIZER = "base64_pickle"
+"""Name of the serializer used before blobs were tagged."""
+
+serializers = {}
+"""Registered serializers as ``{name: (dumps, loads)}``."""
+
+compressions = {}
+"""Registered compressions as ``{name: (compress, decompress)}``."""
+
+
+def register_serializer(name, dumps_func, loads_func):
+    """Register a new serializer under the given name.
+
+    :param name: name used in configuration and stored in the blob tag.
+    :type name: str
+
+    :param dumps_func: callable returning a byte string for a value.
+    :param loads_func: callable returning a value for a byte string.
+    """
+    if HEADER in name.encode("ascii") or "+" in name:
+        raise WorkflowSerializerError("Invalid serializer name: %s" % name)
+    serializers[name] = (dumps_func, loads_func)
+
+
+def register_compression(name, compress_func, decompress_func):
+    """Register a new compression under the given name.
+
+    :param name: name used in configuration and stored in the blob tag.
+    :type name: str
+
+    :param compress_func: callable compressing a byte string.
+    :param decompress_func: callable decompressing a byte string.
+    """
+    if HEADER in name.encode("ascii") or "+" in name:
+        raise WorkflowSerializerError("Invalid compression name: %s" % name)
+    compressions[name] = (compress_func, decompress_func)
+
+
+def _get(registry, name, kind):
+    """Return the registered functions or raise a meaningful error."""
+    try:
+        return registry[name]
+    except KeyError:
+        raise WorkflowSerializerError("Unknown %s: %s" % (kind, name))
+
+
+def dumps(value, serializer=None, compression=None):
+    """Serialize the value into a tagged byte string.
+
+    :param value: value to serialize.
+
+    :param serializer: name of a registered serializer, defaults to
+        ``pickle``.
+    :type serializer: str
+
+    :param compression: name of a registered compression, or None.
+    :type compression: str
+
+    :return: tagged byte string, ready to be stored in a LargeBinary column.
+    """
+    serializer = serializer or "pickle"
+    if serializer == LEGACY_SERIALIZER and not compression:
+        # Untagged blobs are read as legacy ones anyway.
+        return _legacy_dumps(value)
+
+    payload = _get(serializers, serializer, "serializer")[0](value)
+    tag = serializer
+    if compression:
+        payload = _get(compressions, compression, "compression")[0](payload)
+        tag = "%s+%s" % (serializer, compression)
+    return HEADER + tag.encode("ascii") + HEADER + payload
+
+
+def loads(blob):
+    """Deserialize a byte string written by :py:func:`dumps`.
+
+    Blobs written before the introduction of tags are decoded with the
+    legacy ``base64(cPickle)`` format.
+    """
+    if not blob.startswith(HEADER):
+        return _legacy_loads(blob)
+
+    end = blob.index(HEADER, 1)
+    tag = blob[1:end].decode("ascii")
+    payload = blob[end + 1:]
+    serializer, _, compression = tag.partition("+")
+    if compression:
+        payload = _get(compressions, compression, "compression")[1](payload)
+    return _get(serializers, serializer, "serializer")[1](payload)
+
+
+def get_tag(blob):
+    """Return the ``(serializer, compression)`` used to write the blob."""
+    if not blob.startswith(HEADER):
+        return LEGACY_SERIALIZER, None
+    serializer, _, compression = \
+        blob[1:blob.index(HEADER, 1)].decode("ascii").partition("+")
+    return serializer, compression or None
+
+
+def get_options(workflow_definition=None):
+    """Return the ``(serializer, compression)`` to use for new blobs.
+
+    Values defined on the workflow definition take precedence over the
+    configuration.
+    """
+    from invenio_base.globals import cfg
+
+    serializer = getattr(workflow_definition, "serializer", None) or \
+        cfg.get("WORKFLOWS_OBJECT_SERIALIZER", "pickle")
+    compression = getattr(workflow_definition, "compression", None) or \
+        cfg.get("WORKFLOWS_OBJECT_COMPRESSION")
+    return serializer, compression
+
+
+def _legacy_dumps(value):
+    """Serialize as done before tagged blobs existed."""
+    return base64.b64encode(cPickle.dumps(value))
+
+
+def _legacy_loads(blob):
+    """Deserialize blobs written before tagged blobs existed."""
+    return cPickle.loads(base64.b64decode(blob))
+
+
+def _json_dumps(value):
+    """Serialize using compact JSON."""
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads(blob):
+    """Deserialize JSON."""
+    return json.loads(blob.decode("utf-8"))
+
+
+register_serializer(LEGACY_SERIALIZER, _legacy_dumps, _legacy_loads)
+register_serializer(
+    "pickle",
+    lambda value: cPickle.dumps(value, cPickle.HIGHEST_PROTOCOL),
+    cPickle.loads
+)
+register_serializer("msgpack", msgpack.packb, msgpack.unpackb)
+register_serializer("json", _json_dumps, _json_loads)
+
+register_compression("zlib", zlib.compress, zlib.decompress)
+if lz4 is not None:
+    register_compression("lz4", lz4.compress, lz4.decompress)
+
+
+def benchmark(value, number=1000):
+    """Compare the registered serializers on the given value.
+
+    Only serializers able to round-trip the value are reported.
+
+    :param value: sample value, e.g. a record as stored in a workflow object.
+
+    :param number: how many times each value is encoded and decoded.
+    :type number: int
+
+    :return: list of dicts with keys ``name``, ``size``, ``dumps`` and
+        ``loads`` (operations per second), sorted by size.
+    """
+    results = []
+    for serializer in sorted(serializers):
+        for compression in [None] + sorted(compressions):
+            name = serializer if not compression else \
+                "%s+%s" % (serializer, compression)
+            try:
+                blob = dumps(value, serializer, compression)
+                if loads(blob) != value:
+                    continue
+            except Exception:
+                continue
+
+            start = time.time()
+            for dummy in range(number):
+                dumps(value, serializer, compression)
+            dumps_time = time.time() - start
+
+            start = time.time()
+            for dummy in range(number):
+                loads(blob)
+            loads_time = time.time() - start
+
+            results.append({
+                "name": name,
+                "size": len(blob),
+                "dumps": number / max(dumps_time, 1e-9),
+                "loads": number / max(loads_time, 1e-9),
+            })
+    return sorted(results, key=lambda result: result["size"])
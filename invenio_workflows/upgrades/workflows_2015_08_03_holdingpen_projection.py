@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Upgrade recipe."""
+
+import warnings
+
+import sqlalchemy as sa
+
+from invenio_upgrader.api import op
+
+depends_on = [u'workflows_2015_06_05_resize_uuid_columns']
+
+
+def info():
+    """Info message."""
+    return "Add Holding Pen projection tables bwlOBJECTPROJECTION and " \
+           "bwlOBJECTSORTKEY."
+
+
+def do_upgrade():
+    """Implement your upgrades here."""
+    if not op.has_table('bwlOBJECTPROJECTION'):
+        op.create_table(
+            'bwlOBJECTPROJECTION',
+            sa.Column('id_object', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(length=255), nullable=False),
+            sa.Column('description', sa.Text(), nullable=False),
+            sa.Column('action', sa.String(length=150), nullable=False),
+            sa.Column('search_text', sa.Text(), nullable=False),
+            sa.ForeignKeyConstraint(['id_object'], ['bwlOBJECT.id'],
+                                    ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id_object'),
+            mysql_charset='utf8',
+            mysql_engine='MyISAM'
+        )
+        op.create_index('ix_bwlOBJECTPROJECTION_title',
+                        'bwlOBJECTPROJECTION', ['title'])
+    else:
+        warnings.warn(
+            "*** Creation of 'bwlOBJECTPROJECTION' table skipped! ***")
+
+    if not op.has_table('bwlOBJECTSORTKEY'):
+        op.create_table(
+            'bwlOBJECTSORTKEY',
+            sa.Column('id_object', sa.Integer(), nullable=False),
+            sa.Column('key', sa.String(length=64), nullable=False),
+            sa.Column('value', sa.String(length=255), nullable=False),
+            sa.Column('number', sa.Float(), nullable=True),
+            sa.ForeignKeyConstraint(['id_object'], ['bwlOBJECT.id'],
+                                    ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id_object', 'key'),
+            mysql_charset='utf8',
+            mysql_engine='MyISAM'
+        )
+        op.create_index('ix_bwlOBJECTSORTKEY_key_number_value',
+                        'bwlOBJECTSORTKEY', ['key', 'number', 'value'])
+    else:
+        warnings.warn("*** Creation of 'bwlOBJECTSORTKEY' table skipped! ***")
+
+
+def estimate():
+    """Estimate running time of upgrade in seconds (optional)."""
+    return 1
+
+
+def pre_upgrade():
+    """Run pre-upgrade checks (optional)."""
+    pass
+
+
+def post_upgrade():
+    """Run post-upgrade checks (optional)."""
+    warnings.warn("Run 'inveniomanage workflows update_projections' to "
+                  "sort and search existing objects in the Holding Pen.")
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Upgrade recipe."""
+
+import warnings
+
+import sqlalchemy as sa
+
+from invenio_upgrader.api import op
+
+depends_on = [u'workflows_2015_08_03_holdingpen_projection']
+
+
+def info():
+    """Info message."""
+    return "Add Holding Pen search index table bwlOBJECTTERM."
+
+
+def do_upgrade():
+    """Implement your upgrades here."""
+    if not op.has_table('bwlOBJECTTERM'):
+        op.create_table(
+            'bwlOBJECTTERM',
+            sa.Column('term', sa.String(length=64), nullable=False),
+            sa.Column('id_object', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['id_object'], ['bwlOBJECT.id'],
+                                    ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('term', 'id_object'),
+            mysql_charset='utf8',
+            mysql_engine='MyISAM'
+        )
+        op.create_index('ix_bwlOBJECTTERM_id_object',
+                        'bwlOBJECTTERM', ['id_object'])
+    else:
+        warnings.warn("*** Creation of 'bwlOBJECTTERM' table skipped! ***")
+
+
+def estimate():
+    """Estimate running time of upgrade in seconds (optional)."""
+    return 1
+
+
+def pre_upgrade():
+    """Run pre-upgrade checks (optional)."""
+    pass
+
+
+def post_upgrade():
+    """Run post-upgrade checks (optional)."""
+    warnings.warn("Run 'inveniomanage workflows update_projections' to "
+                  "search existing objects in the Holding Pen.")
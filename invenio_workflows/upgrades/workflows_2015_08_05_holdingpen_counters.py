@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Upgrade recipe."""
+
+import warnings
+
+import sqlalchemy as sa
+
+from invenio_upgrader.api import op
+
+from sqlalchemy.dialects import mysql
+
+depends_on = [u'workflows_2015_08_04_holdingpen_terms']
+
+
+def info():
+    """Info message."""
+    return "Add Holding Pen counters table bwlOBJECTCOUNTER."
+
+
+def do_upgrade():
+    """Implement your upgrades here."""
+    op.add_column('bwlOBJECTPROJECTION',
+                  sa.Column('version', mysql.INTEGER(display_width=3),
+                            nullable=False, server_default='0'))
+    op.add_column('bwlOBJECTPROJECTION',
+                  sa.Column('data_type', sa.String(length=150),
+                            nullable=False, server_default=''))
+    op.add_column('bwlOBJECTPROJECTION',
+                  sa.Column('id_user', sa.Integer(),
+                            nullable=False, server_default='0'))
+    op.execute(
+        "UPDATE bwlOBJECTPROJECTION SET "
+        "version = (SELECT version FROM bwlOBJECT "
+        "WHERE bwlOBJECT.id = bwlOBJECTPROJECTION.id_object), "
+        "data_type = (SELECT COALESCE(data_type, '') FROM bwlOBJECT "
+        "WHERE bwlOBJECT.id = bwlOBJECTPROJECTION.id_object), "
+        "id_user = (SELECT id_user FROM bwlOBJECT "
+        "WHERE bwlOBJECT.id = bwlOBJECTPROJECTION.id_object)"
+    )
+
+    if not op.has_table('bwlOBJECTCOUNTER'):
+        op.create_table(
+            'bwlOBJECTCOUNTER',
+            sa.Column('version', mysql.INTEGER(display_width=3),
+                      autoincrement=False, nullable=False),
+            sa.Column('data_type', sa.String(length=150), nullable=False),
+            sa.Column('action', sa.String(length=150), nullable=False),
+            sa.Column('id_user', sa.Integer(), autoincrement=False,
+                      nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('version', 'data_type', 'action',
+                                    'id_user'),
+            mysql_charset='utf8',
+            mysql_engine='MyISAM'
+        )
+        op.execute(
+            "INSERT INTO bwlOBJECTCOUNTER "
+            "(version, data_type, action, id_user, count) "
+            "SELECT version, data_type, action, id_user, COUNT(*) "
+            "FROM bwlOBJECTPROJECTION "
+            "GROUP BY version, data_type, action, id_user"
+        )
+    else:
+        warnings.warn("*** Creation of 'bwlOBJECTCOUNTER' table skipped! ***")
+
+
+def estimate():
+    """Estimate running time of upgrade in seconds (optional)."""
+    return 1
+
+
+def pre_upgrade():
+    """Run pre-upgrade checks (optional)."""
+    pass
+
+
+def post_upgrade():
+    """Run post-upgrade checks (optional)."""
+    pass
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Upgrade recipe."""
+
+import warnings
+
+import sqlalchemy as sa
+
+from invenio_upgrader.api import op
+
+depends_on = [u'workflows_2015_08_05_holdingpen_counters']
+
+
+def info():
+    """Info message."""
+    return "Store the action of workflow objects in bwlOBJECT.action."
+
+
+def do_upgrade():
+    """Implement your upgrades here."""
+    from invenio_workflows.serializers import loads
+
+    op.add_column('bwlOBJECT',
+                  sa.Column('action', sa.String(length=150), nullable=True))
+    op.create_index('ix_bwlOBJECT_action', 'bwlOBJECT', ['action'])
+
+    objects = sa.table('bwlOBJECT',
+                       sa.column('id', sa.Integer),
+                       sa.column('_extra_data', sa.LargeBinary),
+                       sa.column('action', sa.String))
+    update = objects.update().where(
+        objects.c.id == sa.bindparam('_id')
+    ).values(action=sa.bindparam('_action'))
+    bind = op.get_bind()
+    last_id = 0
+    failed = 0
+    while True:
+        rows = bind.execute(
+            sa.select([objects.c.id, objects.c._extra_data]).where(
+                objects.c.id > last_id
+            ).order_by(objects.c.id).limit(1000)
+        ).fetchall()
+        if not rows:
+            break
+        values = []
+        for object_id, extra_data in rows:
+            try:
+                action = loads(extra_data).get('_action')
+            except Exception:
+                failed += 1
+                continue
+            if action:
+                values.append({'_id': object_id, '_action': action})
+        if values:
+            bind.execute(update, values)
+        last_id = rows[-1][0]
+    if failed:
+        warnings.warn("*** Could not read the action of %s objects! ***" %
+                      (failed,))
+
+
+def estimate():
+    """Estimate running time of upgrade in seconds (optional)."""
+    return 1
+
+
+def pre_upgrade():
+    """Run pre-upgrade checks (optional)."""
+    pass
+
+
+def post_upgrade():
+    """Run post-upgrade checks (optional)."""
+    pass
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Upgrade recipe."""
+
+import warnings
+
+import sqlalchemy as sa
+
+from invenio_upgrader.api import op
+
+depends_on = [u'workflows_2015_08_06_object_action']
+
+INDEXES = [
+    ('ix_bwlOBJECT_id_workflow_version', 'bwlOBJECT',
+     ['id_workflow', 'version']),
+    ('ix_bwlOBJECT_id_parent_version', 'bwlOBJECT',
+     ['id_parent', 'version']),
+    ('ix_bwlOBJECTLOGGING_id_object_log_type_created', 'bwlOBJECTLOGGING',
+     ['id_object', 'log_type', 'created']),
+    ('ix_bwlWORKFLOWLOGGING_id_object_log_type_created', 'bwlWORKFLOWLOGGING',
+     ['id_object', 'log_type', 'created']),
+]
+
+
+def info():
+    """Info message."""
+    return "Add composite indexes for the object and log queries."
+
+
+def do_upgrade():
+    """Implement your upgrades here."""
+    inspector = sa.inspect(op.get_bind())
+    for name, table, columns in INDEXES:
+        if name in [index['name'] for index in
+                    inspector.get_indexes(table)]:
+            warnings.warn("*** Creation of index '%s' skipped! ***" % name)
+            continue
+        op.create_index(name, table, columns)
+
+
+def estimate():
+    """Estimate running time of upgrade in seconds (optional)."""
+    return 1
+
+
+def pre_upgrade():
+    """Run pre-upgrade checks (optional)."""
+    pass
+
+
+def post_upgrade():
+    """Run post-upgrade checks (optional)."""
+    pass
@@ -19,11 +19,31 @@
 
 """Various utility functions for use across the workflows module."""
 
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+import atexit
+
+import os
+
+import time
+
 from functools import wraps
 
+from hashlib import md5
+
+from multiprocessing import TimeoutError
+
+from multiprocessing.pool import ThreadPool
+
 from operator import attrgetter
 
-from flask import current_app, jsonify, render_template
+from threading import Lock
+
+from flask import (copy_current_request_context, current_app,
+                   has_request_context, jsonify, render_template)
 
 from invenio_base.helpers import unicodifier
 
@@ -33,9 +53,9 @@ from invenio_base.helpers import unicodifier
 
 import msgpack
 
-from six import text_type
+from six import binary_type, integer_types, string_types, text_type
 
-from sqlalchemy import or_
+from sqlalchemy import and_, or_
 
 from .registry import actions, workflows
 
@@ -142,35 +162,112 @@ class dictproperty(object):
         return self._proxy(obj, self._fget, self._fset, self._fdel)
 
 
+class ExtraDataProxy(MutableMapping):
+
+    """Mapping over decoded extra data keeping track of modifications.
+
+    Keys are read from and written to the wrapped dictionary directly, so
+    the data is decoded once and each access is a plain dictionary lookup.
+    Setting or deleting a key, as well as reading a mutable value which may
+    be modified in place, flags the proxy as ``modified`` so that its owner
+    knows whether the data must be encoded again when saved.
+    """
+
+    immutable_types = integer_types + string_types + (
+        binary_type, text_type, float, bool, tuple, type(None)
+    )
+
+    def __init__(self, data):
+        """Wrap the given decoded extra data."""
+        self.data = data
+        self.modified = False
+
+    def __getitem__(self, key):
+        """Get value from key."""
+        value = self.data[key]
+        if not isinstance(value, self.immutable_types):
+            self.modified = True
+        return value
+
+    def __setitem__(self, key, value):
+        """Set value for key."""
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        """Delete value for key."""
+        del self.data[key]
+        self.modified = True
+
+    def __contains__(self, key):
+        """Check if key is present without flagging a modification."""
+        return key in self.data
+
+    def __iter__(self):
+        """Iterate over keys."""
+        return iter(self.data)
+
+    def __len__(self):
+        """Return the number of keys."""
+        return len(self.data)
+
+    def __repr__(self):
+        """Represent the wrapped data."""
+        return "ExtraDataProxy(%r)" % (self.data,)
+
+
+def get_sort_data_key(value):
+    """Return the key sorting a ``sort_data`` value in the Holding Pen.
+
+    Missing values come first, then numbers, then the other values as
+    text, as sorted in SQL by :py:func:`sort_holdingpen_query`.
+    """
+    if value is None:
+        return 0, 0, u""
+    if isinstance(value, (integer_types, float)) and \
+            not isinstance(value, bool):
+        return 1, value, text_type(value)
+    return 2, 0, text_type(unicodifier(value))[:255]
+
+
 def _sort_from_cache(name, from_data=False):
     def _sorter(item):
+        value = None
         try:
             cached_results = get_formatted_holdingpen_object(item)
             if from_data:
                 # Get value from sort_data
-                return cached_results.get("sort_data", {}).get(name)
+                value = cached_results.get("sort_data", {}).get(name)
             else:
-                return cached_results.get(name)
+                value = cached_results.get(name)
         except Exception:
             current_app.logger.exception(
                 "Invalid format for object {0}: {1}".format(
                     item.id,
-                    cache.get("workflows_holdingpen_{0}".format(item.id))
+                    cache.get(get_holdingpen_cache_key(item))
                 )
             )
+        # Same order as in SQL, ties are sorted on ids
+        if from_data:
+            return get_sort_data_key(value) + (item.id,)
+        return text_type(unicodifier(value or u""))[:255], item.id
     return _sorter
 
 
 def sort_bwolist(bwolist, sort_key):
-    """Sort a list of workflow objects for the list."""
+    """Sort a list of workflow objects for the list.
+
+    Objects are sorted like :py:func:`sort_holdingpen_query` does, ties
+    are sorted on ids.
+    """
     if sort_key == "newest":
-        bwolist.sort(key=attrgetter("created"), reverse=True)
+        bwolist.sort(key=attrgetter("created", "id"), reverse=True)
     elif sort_key == "oldest":
-        bwolist.sort(key=attrgetter("created"), reverse=False)
+        bwolist.sort(key=attrgetter("created", "id"), reverse=False)
     elif sort_key == "updated":
-        bwolist.sort(key=attrgetter("modified"), reverse=True)
+        bwolist.sort(key=attrgetter("modified", "id"), reverse=True)
     elif sort_key == "least_updated":
-        bwolist.sort(key=attrgetter("modified"), reverse=False)
+        bwolist.sort(key=attrgetter("modified", "id"), reverse=False)
     elif sort_key == "title":
         bwolist.sort(key=_sort_from_cache("title"), reverse=False)
     elif sort_key == "title_desc":
@@ -193,12 +290,27 @@ def parse_bwids(bwolist):
     return list(ast.literal_eval(bwolist))
 
 
-def get_holdingpen_objects(ptags=None):
-    """Get BibWorkflowObject's for display in Holding Pen.
+HOLDINGPEN_SQL_SORTS = {
+    "newest": ("created", True),
+    "oldest": ("created", False),
+    "updated": ("modified", True),
+    "least_updated": ("modified", False),
+}
+"""Sort keys of the Holding Pen done by the database, as (column, desc)."""
 
-    Uses DataTable naming for filtering/sorting. Work in progress.
+
+def get_holdingpen_query(ptags=None):
+    """Get the query of BibWorkflowObject's matching Holding Pen tags.
+
+    Version, ``type:``, ``uri:``, ``status:`` and ``action:`` tags are
+    turned into SQL criteria, the other tags are free text terms which can
+    only be checked against the formatted objects, see
+    :py:func:`get_holdingpen_objects`.
+
+    :return: tuple of (query, free text terms)
     """
     from .models import (BibWorkflowObject,
+                         BibWorkflowObjectTerm,
                          ObjectVersion)
 
     if ptags is None:
@@ -209,6 +321,7 @@ def get_holdingpen_objects(ptags=None):
     type_showing = []
     uri_showing = []
     status_showing = []
+    action_showing = []
     for tag in ptags:
         if tag in ObjectVersion.MAPPING:
             version_showing.append(ObjectVersion.MAPPING[tag])
@@ -222,43 +335,316 @@ def get_holdingpen_objects(ptags=None):
         elif tag.startswith("status:"):
             status_showing.append(":".join(tag.split(":")[1:]))
             tags_copy.remove(tag)
+        elif tag.startswith("action:"):
+            action_showing.append(":".join(tag.split(":")[1:]))
+            tags_copy.remove(tag)
 
-    ssearch = tags_copy
-    bwobject_list = BibWorkflowObject.query.filter(
+    query = BibWorkflowObject.query.filter(
         BibWorkflowObject.id_parent == None  # noqa E711
-    ).filter(not version_showing or BibWorkflowObject.version.in_(version_showing),
-        or_(*[BibWorkflowObject.data_type.like(type_.replace("*", "%"))
-              for type_ in type_showing]),
-        or_(*[BibWorkflowObject.uri.like(uri.replace("*", "%"))
-              for uri in uri_showing]),
-        or_(*[BibWorkflowObject.status.like(status.replace("*", "%"))
-              for status in status_showing])
-    ).all()
+    )
+    if version_showing:
+        query = query.filter(BibWorkflowObject.version.in_(version_showing))
+    for column, patterns in ((BibWorkflowObject.data_type, type_showing),
+                             (BibWorkflowObject.uri, uri_showing),
+                             (BibWorkflowObject.status, status_showing),
+                             (BibWorkflowObject.action, action_showing)):
+        if patterns:
+            query = query.filter(or_(*[
+                column.like(pattern.replace("*", "%"))
+                for pattern in patterns
+            ]))
 
+    ssearch = tags_copy
     if ssearch and ssearch[0]:
         if not isinstance(ssearch, list):
             if "," in ssearch:
                 ssearch = ssearch.split(",")
             else:
                 ssearch = [ssearch]
+    else:
+        ssearch = []
+
+    if ssearch and current_app.config.get("WORKFLOWS_HOLDING_PEN_PROJECTION"):
+        # Every word must start a word of the object, see the index
+        for term in ssearch:
+            for word in BibWorkflowObjectTerm.tokenize(term):
+                pattern = word.replace("_", "\\_") + "%"
+                query = query.filter(BibWorkflowObject.id.in_(
+                    BibWorkflowObjectTerm.query.with_entities(
+                        BibWorkflowObjectTerm.id_object
+                    ).filter(BibWorkflowObjectTerm.term.like(pattern,
+                                                             escape="\\"))
+                ))
+        ssearch = []
+    return query, ssearch
+
+
+def sort_holdingpen_query(query, sort_key):
+    """Sort a query of workflow objects in SQL for the list.
+
+    Titles and ``sort_data`` keys are sorted from the values stored along
+    the objects, see :py:class:`.models.BibWorkflowObjectProjection`.
+
+    :return: the sorted query, or None if the sort key needs the formatted
+        objects, see :py:func:`sort_bwolist`.
+    """
+    order = _get_holdingpen_order(query, sort_key)
+    if order is None:
+        return None
+    query, columns, desc = order
+    return query.order_by(*_get_order_by(columns, desc))
 
-        bwobject_list_tmp = []
-        for bwo in bwobject_list:
-            results = {
-                "created": get_pretty_date(bwo),
-                "type": get_type(bwo),
-                "title": None,
-                "description": None
-            }
-            results.update(get_formatted_holdingpen_object(bwo))
 
-            if check_term_in_data(ssearch, results):
-                bwobject_list_tmp.append(bwo)
+def get_holdingpen_previous_next(ptags, sort_key, bwo):
+    """Return the ids of the objects around the given one in the list.
+
+    Neighbours are found with keyset queries on the sort columns, from
+    the tags and sort key of the list, so that the ids of the list need
+    not be kept. Falls back on sorting the formatted objects as done by
+    :py:func:`sort_bwolist`.
+
+    :return: tuple of (previous id, next id), None when there is none.
+    """
+    from .models import BibWorkflowObject
+
+    query, terms = get_holdingpen_query(ptags)
+    order = None if terms else _get_holdingpen_order(query, sort_key)
+    if order is None:
+        object_list = sort_bwolist(get_holdingpen_objects(ptags), sort_key)
+        return get_previous_next_objects([o.id for o in object_list],
+                                         bwo.id)
+
+    query, columns, desc = order
+    values = query.filter(BibWorkflowObject.id == bwo.id).with_entities(
+        *columns
+    ).first()
+    if values is None:
+        # Not in the list
+        return None, None
 
-        bwobject_list = bwobject_list_tmp
+    # Previous objects sort after the current one in descending lists
+    neighbours = []
+    for after in (desc, not desc):
+        neighbour = query.filter(
+            _get_keyset_criterion(columns, values, after)
+        ).order_by(
+            *_get_order_by(columns, not after)
+        ).with_entities(BibWorkflowObject.id).first()
+        neighbours.append(neighbour[0] if neighbour else None)
+    return tuple(neighbours)
+
+
+def _get_holdingpen_order(query, sort_key):
+    """Return the columns to sort the Holding Pen list on.
+
+    :return: tuple of (query joined to the columns, columns, descending),
+        or None if the sort key needs the formatted objects.
+    """
+    from sqlalchemy import case, func
+    from sqlalchemy.orm import aliased
+    from .models import (BibWorkflowObject,
+                         BibWorkflowObjectProjection,
+                         BibWorkflowObjectSortKey)
+
+    desc = False
+    if sort_key in HOLDINGPEN_SQL_SORTS:
+        column, desc = HOLDINGPEN_SQL_SORTS[sort_key]
+        columns = [getattr(BibWorkflowObject, column)]
+    elif not current_app.config.get("WORKFLOWS_HOLDING_PEN_PROJECTION"):
+        return None
+    else:
+        if sort_key.endswith("_desc"):
+            desc = True
+            sort_key = sort_key[:-5]
+        # Missing values are ranked first, as in sort_bwolist, and
+        # coalesced so that they can be compared in keyset queries
+        if sort_key == "title":
+            query = query.outerjoin(BibWorkflowObjectProjection)
+            columns = [func.coalesce(BibWorkflowObjectProjection.title, "")]
+        else:
+            sort_value = aliased(BibWorkflowObjectSortKey)
+            query = query.outerjoin(sort_value, and_(
+                sort_value.id_object == BibWorkflowObject.id,
+                sort_value.key == sort_key
+            ))
+            columns = [case([(sort_value.id_object == None, 0),  # noqa E711
+                             (sort_value.number != None, 1)],  # noqa E711
+                            else_=2),
+                       func.coalesce(sort_value.number, 0),
+                       func.coalesce(sort_value.value, "")]
+
+    # Sort on ids too, for a stable order between pages
+    columns.append(BibWorkflowObject.id)
+    return query, columns, desc
+
+
+def _get_order_by(columns, desc):
+    """Return the ORDER BY clauses of the given columns."""
+    if desc:
+        return [column.desc() for column in columns]
+    return [column.asc() for column in columns]
+
+
+def _get_keyset_criterion(columns, values, after):
+    """Return the criterion of rows sorted after (or before) the values."""
+    criteria = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        criteria.append(and_(*[
+            previous_column == previous_value
+            for previous_column, previous_value in zip(columns[:i],
+                                                       values[:i])
+        ] + [column > value if after else column < value]))
+    return or_(*criteria)
+
+
+def get_holdingpen_objects(ptags=None):
+    """Get BibWorkflowObject's for display in Holding Pen.
+
+    Uses DataTable naming for filtering/sorting. Work in progress.
+    """
+    query, ssearch = get_holdingpen_query(ptags)
+    bwobject_list = query.all()
+
+    if ssearch:
+        bwobject_list = [bwo for bwo in bwobject_list
+                         if _match_holdingpen_terms(bwo, ssearch)]
     return bwobject_list
 
 
+def _match_holdingpen_terms(bwo, ssearch):
+    """Check the free text terms against the formatted object."""
+    results = {
+        "created": get_pretty_date(bwo),
+        "type": get_type(bwo),
+        "title": None,
+        "description": None
+    }
+    results.update(get_formatted_holdingpen_object(bwo))
+    return check_term_in_data(ssearch, results)
+
+
+HOLDINGPEN_EXPORT_COLUMNS = ("id", "id_workflow", "version", "data_type",
+                             "status", "uri", "id_user", "action", "created",
+                             "modified", "title", "description")
+"""Columns of the Holding Pen exports, see :py:func:`export_holdingpen`."""
+
+
+def export_holdingpen(ptags=None, output_format="ndjson", with_data=True,
+                      chunk_size=1000):
+    """Export the objects matching Holding Pen tags, line by line.
+
+    Objects are read by chunks of ids and decoded one at a time, so that
+    the memory used does not depend on the number of objects.
+
+    :param output_format: ``ndjson`` for one JSON document per object, or
+        ``csv`` for :py:data:`HOLDINGPEN_EXPORT_COLUMNS` only.
+    :param with_data: include the decoded data and extra data of the
+        objects in NDJSON exports.
+    :param chunk_size: number of objects read per query.
+
+    :return: generator of lines, a header first for CSV.
+    """
+    import json
+    from invenio_ext.sqlalchemy import db
+    from .models import (BibWorkflowObject,
+                         BibWorkflowObjectProjection,
+                         ObjectVersion)
+
+    if output_format not in ("ndjson", "csv"):
+        raise ValueError("Unknown export format: %s" % (output_format,))
+    if output_format == "csv":
+        yield _get_csv_line(HOLDINGPEN_EXPORT_COLUMNS)
+
+    query, ssearch = get_holdingpen_query(ptags)
+    query = query.outerjoin(BibWorkflowObjectProjection).add_entity(
+        BibWorkflowObjectProjection
+    ).order_by(BibWorkflowObject.id)
+    if with_data and output_format != "csv":
+        query = query.options(db.undefer_group("data"))
+    last_id = None
+    while True:
+        chunk = query
+        if last_id is not None:
+            chunk = chunk.filter(BibWorkflowObject.id > last_id)
+        rows = chunk.limit(chunk_size).all()
+        if not rows:
+            break
+        last_id = rows[-1][0].id
+        for bwo, projection in rows:
+            if ssearch and not _match_holdingpen_terms(bwo, ssearch):
+                continue
+            entry = {
+                "id": bwo.id,
+                "id_workflow": bwo.id_workflow,
+                "version": ObjectVersion.name_from_version(bwo.version),
+                "data_type": bwo.data_type,
+                "status": bwo.status,
+                "uri": bwo.uri,
+                "id_user": bwo.id_user,
+                "action": bwo.action,
+                "created": bwo.created.isoformat(),
+                "modified": bwo.modified.isoformat(),
+                "title": projection.title if projection else None,
+                "description": projection.description if projection else None
+            }
+            if output_format == "csv":
+                yield _get_csv_line([entry[column]
+                                     for column in HOLDINGPEN_EXPORT_COLUMNS])
+                continue
+            if with_data:
+                entry["data"] = bwo.get_data()
+                entry["extra_data"] = bwo.get_extra_data()
+            yield json.dumps(entry, default=text_type) + "\n"
+
+
+def _get_csv_line(values):
+    """Return the values as a line of CSV."""
+    import csv
+    from six import PY2
+    from six.moves import cStringIO
+
+    values = ["" if value is None else text_type(value) for value in values]
+    if PY2:
+        values = [value.encode("utf-8") for value in values]
+    line = cStringIO()
+    csv.writer(line).writerow(values)
+    return line.getvalue()
+
+
+def count_holdingpen_objects(ptags=None):
+    """Count BibWorkflowObject's for display in Holding Pen.
+
+    Counted in SQL unless free text terms are given.
+    """
+    query, ssearch = get_holdingpen_query(ptags)
+    if ssearch:
+        return len(get_holdingpen_objects(ptags))
+    return query.count()
+
+
+def get_holdingpen_counts(**filters):
+    """Return the number of Holding Pen objects per version.
+
+    Read from :py:class:`.models.BibWorkflowObjectCounter` when the
+    projection is enabled, otherwise counted in SQL.
+
+    :param filters: filters on the counters, e.g. ``id_user``.
+    :return: dict of version to number of objects.
+    """
+    from invenio_base.globals import cfg
+    from invenio_ext.sqlalchemy import db
+    from .models import BibWorkflowObject, BibWorkflowObjectCounter
+
+    if cfg.get("WORKFLOWS_HOLDING_PEN_PROJECTION", True):
+        return BibWorkflowObjectCounter.get_counts(**filters)
+    query = db.session.query(
+        BibWorkflowObject.version, db.func.count(BibWorkflowObject.id)
+    ).filter(
+        BibWorkflowObject.id_parent == None  # noqa E711
+    ).filter_by(**filters).group_by(BibWorkflowObject.version)
+    return dict(query)
+
+
 def get_versions_from_tags(tags):
     """Return a tuple with versions from tags.
 
@@ -276,30 +662,190 @@ def get_versions_from_tags(tags):
     return version_showing, tags_copy
 
 
-def get_formatted_holdingpen_object(bwo, date_format='%Y-%m-%d %H:%M:%S.%f'):
-    """Return the formatted output, from cache if available."""
-    results = cache.get("workflows_holdingpen_{0}".format(bwo.id))
-    if results:
-        results = msgpack.loads(
-            cache.get(
-                "workflows_holdingpen_{0}".format(
-                    bwo.id)))
-        if results["date"] == bwo.modified.strftime(date_format):
-            return results
-    results = generate_formatted_holdingpen_object(bwo)
-    if results:
-        cache.set(
-            "workflows_holdingpen_{0}".format(bwo.id),
-            msgpack.dumps(results),
-            timeout=current_app.config.get(
-                "WORKFLOWS_HOLDING_PEN_CACHE_TIMEOUT"
-            )
-        )
+HOLDINGPEN_DATE_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+"""Default format of the dates of the formatted objects."""
+
+
+def get_holdingpen_cache_key(bwo, date_format=HOLDINGPEN_DATE_FORMAT):
+    """Return the cache key of the formatted output of an object.
+
+    The key changes with the modification date of the object, so that
+    outdated entries are never read again and simply expire. It also
+    depends on the format of the date stored in the output.
+    """
+    return "workflows_holdingpen_{0}_{1}_{2}".format(
+        bwo.id, bwo.modified.strftime("%Y%m%d%H%M%S%f"),
+        md5(date_format.encode("utf-8")).hexdigest()[:8]
+    )
+
+
+def get_formatted_holdingpen_objects(bwolist, timeout=None,
+                                     date_format=HOLDINGPEN_DATE_FORMAT):
+    """Return the formatted output of objects, from cache if available.
+
+    All the entries are fetched at once, only the missing ones are
+    generated and they are stored back at once too.
+
+    When a timeout is given and ``WORKFLOWS_HOLDING_PEN_ROW_WORKERS`` is
+    set, the missing entries are generated in a thread pool. Entries not
+    generated within the timeout are replaced by placeholders, they are
+    cached once generated.
+
+    :param bwolist: list of BibWorkflowObject's, e.g. a Holding Pen page.
+    :param timeout: seconds to wait for the entries generated in threads.
+    :param date_format: format of the modification dates of the outputs.
+    :return: list of formatted outputs, in the same order.
+    """
+    from .models import BibWorkflowObject
+
+    keys = [get_holdingpen_cache_key(bwo, date_format) for bwo in bwolist]
+    cached = cache.get_many(*keys) if keys else []
+    cache_timeout = current_app.config.get(
+        "WORKFLOWS_HOLDING_PEN_CACHE_TIMEOUT"
+    )
+    use_pool = timeout is not None and \
+        current_app.config.get("WORKFLOWS_HOLDING_PEN_ROW_WORKERS")
+
+    if not use_pool:
+        BibWorkflowObject.load_data([
+            bwo for bwo, value in zip(bwolist, cached) if not value
+        ])
+
+    results = []
+    missing = {}
+    pending = []
+    for bwo, key, value in zip(bwolist, keys, cached):
+        if value:
+            results.append(msgpack.loads(value))
+            continue
+        if use_pool:
+            pending.append((len(results), bwo,
+                            _generate_in_pool(bwo, key, cache_timeout,
+                                              date_format)))
+            results.append(None)
+            continue
+        formatted = generate_formatted_holdingpen_object(bwo, date_format)
+        if formatted:
+            missing[key] = msgpack.dumps(formatted)
+        results.append(formatted)
+    if missing:
+        cache.set_many(missing, timeout=cache_timeout)
+
+    deadline = time.time() + (timeout or 0)
+    for index, bwo, result in pending:
+        try:
+            results[index] = result.get(
+                max(deadline - time.time(), 0)
+            ) or get_placeholder_holdingpen_object(bwo)
+        except TimeoutError:
+            results[index] = get_placeholder_holdingpen_object(bwo)
     return results
 
 
+_row_pool = None
+_row_pool_key = None
+_row_pool_lock = Lock()
+
+
+def _get_row_pool():
+    """Return the thread pool generating Holding Pen rows.
+
+    The pool is created again when its size changes or in a forked
+    process, the previous one is closed.
+    """
+    global _row_pool, _row_pool_key
+    key = (os.getpid(), current_app.config["WORKFLOWS_HOLDING_PEN_ROW_WORKERS"])
+    with _row_pool_lock:
+        if _row_pool_key != key:
+            if _row_pool is not None and _row_pool_key[0] == key[0]:
+                _row_pool.close()
+            _row_pool = ThreadPool(key[1])
+            _row_pool_key = key
+    return _row_pool
+
+
+@atexit.register
+def close_row_pool():
+    """Wait for the rows being generated and stop the threads."""
+    global _row_pool, _row_pool_key
+    with _row_pool_lock:
+        if _row_pool is not None and _row_pool_key[0] == os.getpid():
+            _row_pool.close()
+            _row_pool.join()
+        _row_pool = _row_pool_key = None
+
+
+def _generate_in_pool(bwo, key, cache_timeout, date_format):
+    """Generate and cache the formatted output of an object in a thread.
+
+    The thread runs in a copy of the current request (or application)
+    context. It loads the object again in its own database session, the
+    objects of the request are never used from the thread.
+
+    :return: the ``AsyncResult`` of the formatted output.
+    """
+    from .models import BibWorkflowObject
+
+    oid = bwo.id
+
+    def generate():
+        obj = BibWorkflowObject.get_with_data(id=oid).first()
+        if obj is None:
+            return None
+        formatted = generate_formatted_holdingpen_object(obj, date_format)
+        if formatted:
+            cache.set(key, msgpack.dumps(formatted), timeout=cache_timeout)
+        return formatted
+
+    if has_request_context():
+        generate = copy_current_request_context(generate)
+    else:
+        app = current_app._get_current_object()
+        generate = with_app_context(app, generate)
+    return _get_row_pool().apply_async(generate)
+
+
+def with_app_context(app, func):
+    """Return a function calling the given one in an application context.
+
+    Used to run functions in other threads, e.g. in a thread pool.
+    """
+    @wraps(func)
+    def decorator(*args, **kwargs):
+        with app.app_context():
+            return func(*args, **kwargs)
+    return decorator
+
+
+def get_placeholder_holdingpen_object(bwo):
+    """Return the formatted output shown while an object is formatted."""
+    return {
+        "name": bwo.get_workflow_name(),
+        "description": "",
+        "title": "{0} #{1}".format(bwo.get_workflow_name() or "", bwo.id),
+        "date": "",
+        "additional": "",
+        "action": "",
+        "sort_data": {}
+    }
+
+
+def get_formatted_holdingpen_object(bwo, date_format=HOLDINGPEN_DATE_FORMAT):
+    """Return the formatted output, from cache if available."""
+    return get_formatted_holdingpen_objects([bwo],
+                                            date_format=date_format)[0]
+
+
+def delete_formatted_holdingpen_object(bwo):
+    """Remove the formatted output of an object from the cache.
+
+    Entries in other date formats are left to expire.
+    """
+    cache.delete(get_holdingpen_cache_key(bwo))
+
+
 def generate_formatted_holdingpen_object(
-        bwo, date_format='%Y-%m-%d %H:%M:%S.%f'):
+        bwo, date_format=HOLDINGPEN_DATE_FORMAT):
     """Generate a dict with formatted column data from Holding Pen object."""
     from .definitions import WorkflowBase
 
@@ -436,7 +982,6 @@ def get_action_list(object_list):
     Get a dictionary mapping from action name to number of Pending
     actions (i.e. halted objects). Used in the holdingpen.index page.
     """
-    action_dict = {}
     found_actions = []
 
     # First get a list of all to count up later
@@ -445,15 +990,48 @@ def get_action_list(object_list):
         if action_name is not None:
             found_actions.append(action_name)
 
-    # Get "real" action name only once per action
-    for action_name in set(found_actions):
+    return _get_action_nicenames(
+        (action_name, found_actions.count(action_name))
+        for action_name in set(found_actions)
+    )
+
+
+def get_action_counts(**filters):
+    """Return a dict of action names mapped to halted objects.
+
+    Same as :py:func:`get_action_list` for all the Holding Pen, read
+    from :py:class:`.models.BibWorkflowObjectCounter` instead of the
+    objects.
+
+    :param filters: filters on the counters, e.g. ``id_user``.
+    """
+    from invenio_ext.sqlalchemy import db
+    from .models import BibWorkflowObjectCounter, ObjectVersion
+
+    query = db.session.query(
+        BibWorkflowObjectCounter.action,
+        db.func.sum(BibWorkflowObjectCounter.count)
+    ).filter(
+        BibWorkflowObjectCounter.version == ObjectVersion.HALTED,
+        BibWorkflowObjectCounter.action != ""
+    ).filter_by(**filters).group_by(BibWorkflowObjectCounter.action)
+    return _get_action_nicenames(
+        (action_name, int(count)) for action_name, count in query if count
+    )
+
+
+def _get_action_nicenames(action_counts):
+    """Map the given (action name, count) pairs by "real" action name."""
+    action_dict = {}
+    for action_name, count in action_counts:
         if action_name not in actions:
             # Perhaps some old action? Use stored name.
             action_nicename = action_name
         else:
             action = actions[action_name]
             action_nicename = getattr(action, "name", action_name)
-        action_dict[action_nicename] = found_actions.count(action_name)
+        action_dict[action_nicename] = action_dict.get(action_nicename,
+                                                       0) + count
     return action_dict
 
 
@@ -470,9 +1048,10 @@ def get_rendered_task_results(obj):
     return results
 
 
-def get_rendered_row(bwo):
+def get_rendered_row(bwo, preformatted=None):
     """Return a single formatted row."""
-    preformatted = get_formatted_holdingpen_object(bwo)
+    if preformatted is None:
+        preformatted = get_formatted_holdingpen_object(bwo)
     return render_template(
         'workflows/list_row.html',
         title=preformatted.get("title", ""),
@@ -484,9 +1063,19 @@ def get_rendered_row(bwo):
 
 
 def get_rows(object_list):
-    """Return all rows formatted."""
-    return [get_rendered_row(bwo)
-            for bwo in object_list]
+    """Return all rows formatted.
+
+    Rows missing from the cache may be formatted in threads, see
+    ``WORKFLOWS_HOLDING_PEN_ROW_WORKERS``.
+    """
+    return [get_rendered_row(bwo, preformatted)
+            for bwo, preformatted in zip(
+                object_list, get_formatted_holdingpen_objects(
+                    object_list,
+                    timeout=current_app.config.get(
+                        "WORKFLOWS_HOLDING_PEN_ROW_TIMEOUT"
+                    )
+                ))]
 
 
 def get_previous_next_objects(object_list, current_object_id):
@@ -35,13 +35,15 @@ import os
 
 from flask import (
     Blueprint,
+    Response,
     abort,
     flash,
     jsonify,
     render_template,
     request,
     send_from_directory,
-    session
+    session,
+    stream_with_context
 )
 
 from flask_breadcrumbs import default_breadcrumb_root, register_breadcrumb
@@ -60,19 +62,31 @@ from invenio_utils.pagination import Pagination
 
 from six import text_type
 
+from sqlalchemy.orm.exc import NoResultFound
+
 from ..acl import viewholdingpen
-from ..api import continue_oid_delayed, start_delayed
+from ..api import (
+    continue_oid_delayed,
+    delete_objects,
+    resolve_actions,
+    start_delayed
+)
 from ..models import BibWorkflowObject, ObjectVersion, Workflow
 from ..registry import actions, workflows
 from ..utils import (
     alert_response_wrapper,
+    count_holdingpen_objects,
+    export_holdingpen,
     extract_data,
     get_data_types,
+    get_holdingpen_counts,
     get_holdingpen_objects,
-    get_previous_next_objects,
+    get_holdingpen_previous_next,
+    get_holdingpen_query,
     get_rendered_task_results,
     get_rows,
-    sort_bwolist
+    sort_bwolist,
+    sort_holdingpen_query
 )
 
 
@@ -122,14 +136,9 @@ def index():
     Acts as a hub for catalogers (may be removed)
     """
     # TODO: Add user filtering
-    error_state = get_holdingpen_objects(
-        [ObjectVersion.name_from_version(ObjectVersion.ERROR)]
-    )
-    halted_state = get_holdingpen_objects(
-        [ObjectVersion.name_from_version(ObjectVersion.HALTED)]
-    )
-    return dict(error_state=error_state,
-                halted_state=halted_state)
+    counts = get_holdingpen_counts()
+    return dict(error_count=counts.get(ObjectVersion.ERROR, 0),
+                halted_count=counts.get(ObjectVersion.HALTED, 0))
 
 
 @blueprint.route('/load', methods=['GET', 'POST'])
@@ -149,11 +158,19 @@ def load(page, per_page, sort_key):
         'sort_key', session.get('holdingpen_sort_key', "updated")
     )
     per_page = per_page or session.get('holdingpen_per_page') or 10
-    object_list = get_holdingpen_objects(tags)
-    object_list = sort_bwolist(object_list, sort_key)
+
+    # Filter, sort and paginate in SQL when no formatted data is needed
+    query, terms = get_holdingpen_query(tags)
+    sorted_query = None if terms else sort_holdingpen_query(query, sort_key)
+    if sorted_query is not None:
+        total_count = query.order_by(None).count()
+    else:
+        object_list = get_holdingpen_objects(tags)
+        object_list = sort_bwolist(object_list, sort_key)
+        total_count = len(object_list)
 
     page = max(page, 1)
-    pagination = Pagination(page, per_page, len(object_list))
+    pagination = Pagination(page, per_page, total_count)
 
     # Make sure requested page is within limits.
     if pagination.page > pagination.pages:
@@ -179,18 +196,25 @@ def load(page, per_page, sort_key):
         }
     }
 
-    # Add current ids in table for use by previous/next
-    session['holdingpen_current_ids'] = [o.id for o in object_list]
-    session['holdingpen_sort_key'] = sort_key
-    session['holdingpen_per_page'] = per_page
-    session['holdingpen_tags'] = tags
-
     display_start = max(pagination.per_page * (pagination.page - 1), 0)
     display_end = min(
         pagination.per_page * pagination.page,
         pagination.total_count
     )
-    table_data["rows"] = get_rows(object_list[display_start:display_end])
+    if sorted_query is not None:
+        page_objects = sorted_query.offset(display_start).limit(
+            display_end - display_start
+        ).all()
+    else:
+        page_objects = object_list[display_start:display_end]
+
+    # Keep the list descriptor for use by previous/next
+    session.pop('holdingpen_current_ids', None)
+    session['holdingpen_sort_key'] = sort_key
+    session['holdingpen_per_page'] = per_page
+    session['holdingpen_tags'] = tags
+
+    table_data["rows"] = get_rows(page_objects)
     table_data["rendered_rows"] = "".join(table_data["rows"])
     return jsonify(table_data)
 
@@ -210,12 +234,38 @@ def list_objects():
     return render_template(
         'workflows/list.html',
         tags=json.dumps(tags_to_print),
-        object_list=get_holdingpen_objects(tags),
+        total_found=count_holdingpen_objects(tags),
         type_list=get_data_types(),
         per_page=session.get('holdingpen_per_page')
     )
 
 
+@blueprint.route('/export', methods=['GET', ])
+@login_required
+@permission_required(viewholdingpen.name)
+@wash_arguments({
+    'output_format': (text_type, "ndjson"),
+    'with_data': (int, 1),
+})
+def export(output_format, with_data):
+    """Stream the objects of the current Holding Pen list."""
+    tags = request.args.getlist("tags[]") or session.get(
+        "holdingpen_tags",
+        [ObjectVersion.name_from_version(ObjectVersion.HALTED)]
+    )
+    if output_format not in ("ndjson", "csv"):
+        abort(400)
+    mimetype = "text/csv" if output_format == "csv" else \
+        "application/x-ndjson"
+    return Response(
+        stream_with_context(export_holdingpen(tags, output_format,
+                                              bool(with_data))),
+        mimetype=mimetype,
+        headers={"Content-Disposition":
+                 "attachment; filename=holdingpen.{0}".format(output_format)}
+    )
+
+
 @blueprint.route('/<int:objectid>', methods=['GET', 'POST'])
 @blueprint.route('/details/<int:objectid>', methods=['GET', 'POST'])
 @register_breadcrumb(blueprint, '.details', _("Object Details"))
@@ -232,9 +282,13 @@ def details(objectid):
     bwobject.data = bwobject.get_data()
     bwobject.extra_data = bwobject.get_extra_data()
 
-    previous_object, next_object = get_previous_next_objects(
-        session.get("holdingpen_current_ids"),
-        objectid
+    previous_object, next_object = get_holdingpen_previous_next(
+        session.get(
+            "holdingpen_tags",
+            [ObjectVersion.name_from_version(ObjectVersion.HALTED)]
+        ),
+        session.get("holdingpen_sort_key", "updated"),
+        bwobject
     )
     formatted_data = bwobject.get_formatted_data()
     extracted_data = extract_data(bwobject)
@@ -406,9 +460,10 @@ def delete_from_db(objectid):
 def delete_multi(bwolist):
     """Delete list of objects from the db."""
     from ..utils import parse_bwids
-    bwolist = parse_bwids(bwolist)
-    for objectid in bwolist:
-        delete_from_db(objectid)
+    try:
+        delete_objects(parse_bwids(bwolist))
+    except NoResultFound:
+        abort(404)
     return jsonify(dict(
         category="success",
         message=_("Objects deleted successfully.")
@@ -424,19 +479,14 @@ def resolve_action():
     Will call the resolve() function of the specific action.
     """
     objectids = request.values.getlist('objectids[]') or []
-    ids_resolved = 0
-
-    for objectid in objectids:
-        bwobject = BibWorkflowObject.query.get_or_404(objectid)
-        action_name = bwobject.get_action()
-
-        if action_name:
-            action_form = actions[action_name]
-            res = action_form().resolve(bwobject)
-            ids_resolved += 1
+    try:
+        results = resolve_actions(objectids)
+    except NoResultFound:
+        abort(404)
+    ids_resolved = len(results)
 
     if ids_resolved == 1:
-        return jsonify(res)
+        return jsonify(results[0])
     elif ids_resolved == 0:
         return jsonify({
             "message": "No records resolved!",
@@ -30,8 +30,8 @@ from flask_menu import register_menu
 from invenio_base.decorators import templated
 from invenio_base.i18n import _
 
-from .holdingpen import get_holdingpen_objects
 from ..models import ObjectVersion
+from ..utils import get_holdingpen_counts
 
 
 blueprint = Blueprint(
@@ -56,7 +56,6 @@ blueprint = Blueprint(
 )
 @templated("workflows/settings/index.html")
 def index():
-    error_state = get_holdingpen_objects([ObjectVersion.name_from_version(ObjectVersion.ERROR)])
-    halted_state = get_holdingpen_objects([ObjectVersion.name_from_version(ObjectVersion.HALTED)])
-    return dict(error_state=error_state,
-                halted_state=halted_state)
+    counts = get_holdingpen_counts()
+    return dict(error_count=counts.get(ObjectVersion.ERROR, 0),
+                halted_count=counts.get(ObjectVersion.HALTED, 0))
@@ -18,10 +18,17 @@
 
 """Mediator between API and workers responsible for running the workflows."""
 
+from datetime import datetime
+
+from invenio_base.globals import cfg
+
+from invenio_ext.sqlalchemy import db
+from invenio_ext.sqlalchemy.utils import session_manager
+
 from .client import run_workflow, continue_execution
 from .engine import BibWorkflowEngine
 from .models import BibWorkflowObject, Workflow, ObjectVersion
-from .errors import WorkflowObjectVersionError
+from .errors import WorkflowError, WorkflowObjectVersionError
 
 
 def run_worker(wname, data, **kwargs):
@@ -64,30 +71,63 @@ def restart_worker(wid, **kwargs):
     workflow = Workflow.query.get(wid)
     engine = BibWorkflowEngine(workflow_object=workflow,
                                **kwargs)
+    # Objects are counted again while they run
+    engine.set_counter_initial(0)
 
     if "data" not in kwargs:
-        objects = []
-        # First we get all initial objects
-        initials = BibWorkflowObject.query.filter(
-            BibWorkflowObject.id_workflow == wid,
-            BibWorkflowObject.version == ObjectVersion.INITIAL
-        ).all()
-
-        # Then we reset their children to the same state as initial
-        for initial_object in initials:
-            running_object = BibWorkflowObject.query.filter(
-                BibWorkflowObject.id == initial_object.id_parent
-            ).one()
+        objects = reset_objects_to_initial(wid)
+    else:
+        objects = get_workflow_object_instances(kwargs["data"], engine)
+    run_workflow(wfe=engine, data=objects, **kwargs)
+    return engine
+
+
+@session_manager
+def reset_objects_to_initial(wid):
+    """Reset the objects of a workflow to the state of their initial snapshot.
+
+    The objects are fetched by chunks of
+    ``WORKFLOWS_BULK_INGESTION_CHUNK_SIZE`` snapshots and all of them are
+    committed at once.
+
+    :param wid: workflow id (uuid) of the objects to reset
+    :type wid: str
+
+    :return: list of reset BibWorkflowObject, in the order of the snapshots
+    """
+    from sqlalchemy.orm.exc import NoResultFound
+
+    # First we get all initial objects
+    initials = BibWorkflowObject.get_with_data(
+        BibWorkflowObject.id_workflow == wid,
+        BibWorkflowObject.version == ObjectVersion.INITIAL
+    ).order_by(BibWorkflowObject.id).all()
+    chunk_size = cfg.get("WORKFLOWS_BULK_INGESTION_CHUNK_SIZE") or 1000
+
+    objects = []
+    for start in range(0, len(initials), chunk_size):
+        chunk = initials[start:start + chunk_size]
+        # Then we reset their children to the same state as initial, the
+        # data of the children is overwritten so it is not fetched.
+        running_objects = dict(
+            (obj.id, obj) for obj in BibWorkflowObject.get(
+                BibWorkflowObject.id.in_([initial_object.id_parent
+                                          for initial_object in chunk])
+            )
+        )
+        for initial_object in chunk:
+            running_object = running_objects.get(initial_object.id_parent)
+            if running_object is None:
+                raise NoResultFound(
+                    "No object for the snapshot {0}".format(initial_object.id)
+                )
             old_id_parent = running_object.id_parent
             running_object.copy(initial_object)
             running_object.id_parent = old_id_parent
-            running_object.save()
+            running_object.stage()
 
             objects.append(running_object)
-    else:
-        objects = get_workflow_object_instances(kwargs["data"], engine)
-    run_workflow(wfe=engine, data=objects, **kwargs)
-    return engine
+    return objects
 
 
 def continue_worker(oid, restart_point="continue_next",
@@ -123,6 +163,55 @@ def continue_worker(oid, restart_point="continue_next",
     return engine
 
 
+def continue_objects_worker(wid, oids, restart_point="continue_next",
+                            task_offset=1, save_engine=True, **kwargs):
+    """Continue several objects of a workflow with a single engine.
+
+    Same as :py:func:`continue_worker` for each object, except that the
+    workflow is loaded once and objects are fetched by chunks of
+    ``WORKFLOWS_BULK_INGESTION_CHUNK_SIZE``. An error of an object is
+    saved on it, as usual, and does not stop the other objects.
+
+    :param wid: workflow id (uuid) of the objects
+    :type wid: str
+
+    :param oids: ids of the objects to continue
+    :type oids: list
+
+    :param restart_point: point to continue from, see
+        :py:func:`continue_worker`
+    :type restart_point: str
+
+    :param save_engine: save the engine before continuing the objects.
+        Set it to False when the caller already saved it, e.g. when chunks
+        of objects of the same workflow are continued concurrently.
+    :type save_engine: bool
+
+    :return: generator of (object id, version of the continued object)
+    """
+    workflow = Workflow.query.get(wid)
+    engine = BibWorkflowEngine(workflow.name,
+                               workflow_object=workflow,
+                               **kwargs)
+    if save_engine:
+        engine.save()
+    oids = list(oids)
+    chunk_size = cfg.get("WORKFLOWS_BULK_INGESTION_CHUNK_SIZE") or 1000
+    for start in range(0, len(oids), chunk_size):
+        # Objects are expired by each commit, their data is not prefetched
+        for workflow_object in BibWorkflowObject.get(
+                BibWorkflowObject.id.in_(oids[start:start + chunk_size]),
+                BibWorkflowObject.id_workflow == wid
+        ).order_by(BibWorkflowObject.id):
+            try:
+                continue_execution(engine, workflow_object, restart_point,
+                                   task_offset, **kwargs)
+            except WorkflowError:
+                # Already logged and saved on the object
+                pass
+            yield workflow_object.id, workflow_object.version
+
+
 def get_workflow_object_instances(data, engine):
     """Analyze data and create corresponding BibWorkflowObjects.
 
@@ -136,6 +225,11 @@ def get_workflow_object_instances(data, engine):
     This function also takes into account if given data objects are already
     BibWorkflowObject instances.
 
+    Other data objects are wrapped in bulk, by chunks of
+    ``WORKFLOWS_BULK_INGESTION_CHUNK_SIZE`` items (see
+    :py:func:`create_data_objects_from_data`). Set it to 0 to create the
+    objects one by one.
+
     :param data: list of data objects to wrap
     :type data: list
 
@@ -146,6 +240,9 @@ def get_workflow_object_instances(data, engine):
     """
     workflow_objects = []
     data_type = None
+    chunk_size = cfg.get("WORKFLOWS_BULK_INGESTION_CHUNK_SIZE")
+    # Positions in workflow_objects of data waiting for bulk creation
+    pending = []
     if isinstance(data, BibWorkflowObject):
         # A BibWorkflowObject was passed directly, put it in a list.
         data = [data]
@@ -167,6 +264,10 @@ def get_workflow_object_instances(data, engine):
             # Data is not already a BibWorkflowObject, we then
             # create initial + running object pairs for each data object.
             # Then we add the running object to run through the workflow.
+            if chunk_size:
+                pending.append((len(workflow_objects), data_object))
+                workflow_objects.append(None)
+                continue
             current_obj = create_data_object_from_data(
                 data_object,
                 engine,
@@ -174,6 +275,16 @@ def get_workflow_object_instances(data, engine):
             )
             workflow_objects.append(current_obj)
 
+    for start in range(0, len(pending), chunk_size or 1):
+        chunk = pending[start:start + chunk_size]
+        current_objs = create_data_objects_from_data(
+            [data_object for dummy, data_object in chunk],
+            engine,
+            data_type
+        )
+        for (position, dummy), current_obj in zip(chunk, current_objs):
+            workflow_objects[position] = current_obj
+
     return workflow_objects
 
 
@@ -209,8 +320,8 @@ def generate_snapshot(workflow_object, engine):
             id_workflow=engine.uuid,
             version=workflow_object.version
         )
-        initial_object.log.debug("Created new object revision: %s"
-                                 % (initial_object.id,))
+        initial_object.log.debug("Created new object revision: %s",
+                                 initial_object.id)
         # Propagate the parent id
         initial_object.id_parent = workflow_object.id
         workflow_object.save()
@@ -256,3 +367,67 @@ def create_data_object_from_data(data_object, engine, data_type):
 
     generate_snapshot(current_obj, engine)
     return current_obj
+
+
+@session_manager
+def create_data_objects_from_data(data_objects, engine, data_type):
+    """Create new BibWorkflowObjects from given data in bulk.
+
+    Bulk version of :py:func:`create_data_object_from_data`: the objects
+    to run are inserted without the unit of work and their ids are taken
+    from the inserts themselves. Their initial snapshots are then
+    inserted with a multi-row statement pointing to them. Data is encoded
+    once for both and everything is committed at once.
+
+    :param data_objects: objects containing the data
+    :type data_objects: list
+
+    :param engine: Instance of Workflow that is currently running.
+    :type engine: py:class:`.engine.BibWorkflowEngine`
+
+    :param data_type: type of the data given as taken from workflow definition.
+    :type data_type: str
+
+    :returns: list of new BibWorkflowObject, in the order of the data
+    """
+    from sqlalchemy.orm import make_transient_to_detached
+    from .models import add_pending_projections, get_default_extra_data
+
+    if not data_objects:
+        return []
+    now = datetime.now()
+    id_workflow = str(engine.uuid)
+    extra_data = get_default_extra_data(
+        engine.db_obj.get_workflow_definition())
+    # Other columns get the defaults of the model
+    current_objs = [BibWorkflowObject(
+        _data=engine.db_obj.dumps(data_object),
+        _extra_data=extra_data,
+        id_workflow=id_workflow,
+        version=ObjectVersion.INITIAL,
+        id_parent=None,
+        created=now,
+        modified=now,
+        data_type=data_type,
+    ) for data_object in data_objects]
+    db.session.bulk_save_objects(current_objs, return_defaults=True)
+    for current_obj in current_objs:
+        # Persistent instances, without flush
+        make_transient_to_detached(current_obj)
+        db.session.add(current_obj)
+    ids = [current_obj.id for current_obj in current_objs]
+
+    db.session.execute(BibWorkflowObject.__table__.insert(), [{
+        "_data": parent._data,
+        "id_workflow": id_workflow,
+        "version": ObjectVersion.INITIAL,
+        "id_parent": parent.id,
+        "data_type": data_type,
+        "created": now,
+        "modified": now,
+    } for parent in current_objs])
+    if cfg.get("WORKFLOWS_HOLDING_PEN_PROJECTION", True):
+        add_pending_projections(ids)
+    engine.log.debug("Created %s objects with their initial snapshots",
+                     len(current_objs))
+    return current_objs
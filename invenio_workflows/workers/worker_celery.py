@@ -17,6 +17,8 @@
 # along with Invenio; if not, write to the Free Software Foundation, Inc.,
 # 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
 
+from celery import group
+
 from invenio_base.helpers import with_app_context
 
 from invenio_celery import celery
@@ -67,6 +69,15 @@ def celery_continue(oid, restart_point, **kwargs):
     return continue_worker(oid, restart_point, **kwargs).uuid
 
 
+@celery.task(name='invenio_workflows.workers.worker_celery.reconcile_counters')
+@with_app_context()
+@session_manager
+def celery_reconcile_counters():
+    """Recompute the Holding Pen counters, to be scheduled periodically."""
+    from ..models import BibWorkflowObjectCounter
+    BibWorkflowObjectCounter.reconcile()
+
+
 class worker_celery(object):
 
     """Used by :py:class:`.api.WorkerBackend` to call the worker functions."""
@@ -102,6 +113,20 @@ class worker_celery(object):
         return CeleryResult(celery_continue.delay(
             oid, restart_point, **kwargs))
 
+    def continue_workers(self, oids, restart_point, **kwargs):
+        """Submit the continuation of several objects as one Celery group.
+
+        :param oids: uuids of the objects to be started
+        :type oids: list
+
+        :param restart_point: sets the start point
+        :type restart_point: str
+        """
+        result = group(
+            celery_continue.s(oid, restart_point, **kwargs) for oid in oids
+        ).apply_async()
+        return [CeleryResult(oid_result) for oid_result in result.results]
+
 
 class CeleryResult(AsynchronousResultWrapper):
 
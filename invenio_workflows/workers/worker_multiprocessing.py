@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Run the workflows in a pool of local processes, without broker.
+
+Set ``CFG_BIBWORKFLOW_WORKER = "worker_multiprocessing"`` to use it. The
+size of the pool is ``WORKFLOWS_MULTIPROCESSING_WORKERS``.
+
+Each process creates its own application, hence its own database engine,
+the first time it runs a workflow. The connections inherited from the
+parent process are discarded before, without being closed: they are
+still used by the parent process. The objects given to the workflows
+must be committed before, the processes read them from the database.
+
+Objects of the same workflow can be continued in several processes at
+once, the workflow counters are updated in SQL. The same object must not
+be continued twice at the same time.
+"""
+
+from threading import Lock
+
+from concurrent.futures import ProcessPoolExecutor
+
+from flask import current_app
+
+from invenio_base.globals import cfg
+
+from invenio_ext.sqlalchemy import db
+
+from invenio_workflows.errors import WorkflowWorkerError
+from invenio_workflows.worker_result import AsynchronousResultWrapper
+
+_executor = None
+_executor_lock = Lock()
+
+_app = None
+
+_parent_app = None
+
+_inherited_pools = []
+
+
+def get_executor():
+    """Return the pool of processes running the workflows."""
+    global _executor, _parent_app
+    with _executor_lock:
+        if _executor is None:
+            _parent_app = current_app._get_current_object()
+            _executor = ProcessPoolExecutor(
+                cfg.get("WORKFLOWS_MULTIPROCESSING_WORKERS") or None
+            )
+    return _executor
+
+
+def _discard_parent_engine():
+    """Discard the connections inherited from the parent process.
+
+    Closing them would close the sockets of the parent process too, so the
+    pool of the engine is replaced instead. The inherited pool is kept
+    referenced, its connections are never garbage collected and closed.
+    """
+    if _parent_app is None:
+        return
+    with _parent_app.app_context():
+        engine = db.engine
+        _inherited_pools.append(engine.pool)
+        try:
+            engine.dispose(close=False)
+        except TypeError:
+            # SQLAlchemy < 1.4.33 closes the connections on dispose()
+            engine.pool = engine.pool.recreate()
+
+
+def _get_app():
+    """Return the application of the current process, created once."""
+    global _app
+    if _app is None:
+        from invenio_base.factory import create_app
+        # Connections of the parent process must not be used from here,
+        # a new application comes with its own database engine.
+        _discard_parent_engine()
+        _app = create_app()
+    return _app
+
+
+def multiprocessing_run(workflow_name, data, **kwargs):
+    """Run the workflow in a process of the pool."""
+    from ..worker_engine import run_worker
+    from ..utils import BibWorkflowObjectIdContainer
+
+    with _get_app().app_context():
+        if not isinstance(data, list):
+            raise WorkflowWorkerError("Data is not a list: %r" % (data,))
+        # Objects were replaced by their id, see api.start_delayed
+        for i in range(0, len(data)):
+            if isinstance(data[i], dict):
+                if str(BibWorkflowObjectIdContainer().__class__) in data[i]:
+                    data[i] = BibWorkflowObjectIdContainer().from_dict(data[
+                        i]).get_object()
+        return run_worker(workflow_name, data, **kwargs).uuid
+
+
+def multiprocessing_restart(wid, **kwargs):
+    """Restart the workflow in a process of the pool."""
+    from ..worker_engine import restart_worker
+
+    with _get_app().app_context():
+        return restart_worker(wid, **kwargs).uuid
+
+
+def multiprocessing_continue(oid, restart_point, **kwargs):
+    """Continue the object in a process of the pool."""
+    from ..worker_engine import continue_worker
+
+    with _get_app().app_context():
+        # We need to return the uuid because of AsynchronousResultWrapper
+        return continue_worker(oid, restart_point, **kwargs).uuid
+
+
+class worker_multiprocessing(object):
+
+    """Used by :py:class:`.api.WorkerBackend` to call the worker functions."""
+
+    def run_worker(self, workflow_name, data, **kwargs):
+        """Submit the workflow to the pool of processes.
+
+        :param workflow_name: name of the workflow to be run
+        :type workflow_name: str
+
+        :param data: list of objects for the workflow
+        :type data: list
+        """
+        return MultiprocessingResult(get_executor().submit(
+            multiprocessing_run, workflow_name, data, **kwargs))
+
+    def restart_worker(self, wid, **kwargs):
+        """Submit the restart of the workflow to the pool of processes.
+
+        :param wid: uuid of the workflow to be run
+        :type wid: str
+        """
+        return MultiprocessingResult(get_executor().submit(
+            multiprocessing_restart, wid, **kwargs))
+
+    def continue_worker(self, oid, restart_point, **kwargs):
+        """Submit the continuation of the object to the pool of processes.
+
+        :param oid: id of the object to be continued
+        :type oid: int
+
+        :param restart_point: sets the start point
+        :type restart_point: str
+        """
+        return MultiprocessingResult(get_executor().submit(
+            multiprocessing_continue, oid, restart_point, **kwargs))
+
+    def continue_workers(self, oids, restart_point, **kwargs):
+        """Submit the continuation of several objects to the pool.
+
+        :param oids: ids of the objects to be continued
+        :type oids: list
+
+        :param restart_point: sets the start point
+        :type restart_point: str
+        """
+        return [self.continue_worker(oid, restart_point, **kwargs)
+                for oid in oids]
+
+
+class MultiprocessingResult(AsynchronousResultWrapper):
+
+    """Wrapped future of a workflow running in the pool of processes.
+
+    Like with Celery, the processes return the uuid of the workflow
+    instead of the BibWorkflowEngine, which cannot be serialized.
+
+    :param asynchronousresult: the ``concurrent.futures.Future``
+    """
+
+    @property
+    def status(self):
+        """Return the status, named like the Celery ones."""
+        future = self.asyncresult
+        if not future.done():
+            return "STARTED" if future.running() else "PENDING"
+        if future.cancelled() or future.exception() is not None:
+            return "FAILURE"
+        return "SUCCESS"
+
+    def get(self, postprocess=None):
+        """Wait for the workflow and return its result.
+
+        :param postprocess: function to postprocess the result
+        :type postprocess: callable function
+
+        :return: the postprocess result (i.e. BibWorkflowEngine)
+        """
+        if postprocess is None:
+            return self.asyncresult.result()
+        else:
+            return postprocess(self.asyncresult.result())
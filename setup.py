@@ -114,6 +114,9 @@ setup(
             'Sphinx>=1.3',
             'sphinx_rtd_theme>=0.1.7'
         ],
+        'multiprocessing': [
+            'futures>=3.0.0',
+        ],
         'tests': test_requirements
     },
     classifiers=[
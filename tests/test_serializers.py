@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of Invenio.
+# Copyright (C) 2015 CERN.
+#
+# Invenio is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# Invenio is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with Invenio; if not, write to the Free Software Foundation, Inc.,
+# 59 Temple Place, Suite 330, Boston, MA 02111-1307, USA.
+
+"""Unit tests for the serializers of workflow data."""
+
+from __future__ import absolute_import
+
+import base64
+
+from invenio_testing import InvenioTestCase
+
+from six.moves import cPickle
+
+
+class SerializersTest(InvenioTestCase):
+
+    """Test the serializers of object data."""
+
+    record = {"245__": [{"a": "A title"}], "700__": [{"a": "Doe, J."}] * 10}
+
+    def test_round_trip(self):
+        """Test that every serializer reads back what it wrote."""
+        from invenio_workflows.serializers import dumps, loads
+
+        for serializer in ("pickle", "msgpack", "json", "base64_pickle"):
+            for compression in (None, "zlib"):
+                blob = dumps(self.record, serializer, compression)
+                self.assertEqual(self.record, loads(blob))
+
+    def test_tag(self):
+        """Test that the serializer is stored alongside the blob."""
+        from invenio_workflows.serializers import dumps, get_tag
+
+        self.assertEqual(("msgpack", "zlib"),
+                         get_tag(dumps(self.record, "msgpack", "zlib")))
+        self.assertEqual(("pickle", None),
+                         get_tag(dumps(self.record, "pickle")))
+
+    def test_legacy_blobs(self):
+        """Test that untagged base64 pickles are still readable."""
+        from invenio_workflows.serializers import loads, get_tag
+
+        blob = base64.b64encode(cPickle.dumps(self.record))
+        self.assertEqual(self.record, loads(blob))
+        self.assertEqual(("base64_pickle", None), get_tag(blob))
+
+    def test_smaller_than_legacy(self):
+        """Test that the default serializer does not inflate blobs."""
+        from invenio_workflows.serializers import dumps
+
+        legacy = base64.b64encode(cPickle.dumps(self.record))
+        self.assertTrue(len(dumps(self.record)) < len(legacy))
+
+    def test_unknown_serializer(self):
+        """Test that unknown serializers raise an explicit error."""
+        from invenio_workflows.errors import WorkflowSerializerError
+        from invenio_workflows.serializers import dumps
+
+        self.assertRaises(WorkflowSerializerError,
+                          dumps, self.record, "unknown")
+        self.assertRaises(WorkflowSerializerError,
+                          dumps, self.record, "pickle", "unknown")
+
+    def test_object_uses_configuration(self):
+        """Test that objects are written with the configured serializer."""
+        from invenio_workflows.models import (BibWorkflowObject,
+                                              get_default_data,
+                                              get_default_extra_data)
+        from invenio_workflows.serializers import get_tag
+
+        self.app.config["WORKFLOWS_OBJECT_SERIALIZER"] = "json"
+        self.app.config["WORKFLOWS_OBJECT_COMPRESSION"] = "zlib"
+        try:
+            obj = BibWorkflowObject()
+            obj.set_data(self.record)
+            self.assertEqual(("json", "zlib"), get_tag(obj._data))
+            self.assertEqual(self.record, obj.get_data())
+            self.assertEqual(("json", "zlib"),
+                             get_tag(get_default_extra_data()))
+            self.assertEqual(("json", "zlib"), get_tag(get_default_data()))
+        finally:
+            self.app.config["WORKFLOWS_OBJECT_SERIALIZER"] = "pickle"
+            self.app.config["WORKFLOWS_OBJECT_COMPRESSION"] = None
@@ -57,3 +57,337 @@ class HoldingPenUtilsTest(InvenioTestCase):
         from invenio_workflows.utils import get_previous_next_objects
         objects = [3, 4, 5]
         self.assertEqual(get_previous_next_objects(objects, 4), (3, 5))
+
+
+class HoldingPenQueryTest(InvenioTestCase):
+
+    """Test the Holding Pen queries done in SQL."""
+
+    def setUp(self):
+        """Create objects to list."""
+        from datetime import datetime, timedelta
+        from uuid import uuid1 as new_uuid
+        from invenio_workflows.models import (BibWorkflowObject,
+                                              ObjectVersion, Workflow)
+
+        now = datetime.now()
+        self.workflow = Workflow(name='demo_workflow', uuid=new_uuid(),
+                                 id_user=0, module_name="unit_tests")
+        self.objects = [
+            BibWorkflowObject(workflow=self.workflow,
+                              version=ObjectVersion.HALTED,
+                              data_type="test_type_%s" % (i % 2,),
+                              created=now - timedelta(days=i),
+                              modified=now - timedelta(days=3 - i))
+            for i in range(4)
+        ]
+        self.create_objects([self.workflow] + self.objects)
+
+    def tearDown(self):
+        """Remove created objects."""
+        self.delete_objects(self.objects + [self.workflow])
+
+    def _get_ids(self, objects):
+        ids = set(obj.id for obj in self.objects)
+        return [obj.id for obj in objects if obj.id in ids]
+
+    def test_sort_in_sql(self):
+        """Test that SQL sorts give the same order as Python ones."""
+        from invenio_workflows.utils import (HOLDINGPEN_SQL_SORTS,
+                                             get_holdingpen_objects,
+                                             get_holdingpen_query,
+                                             sort_bwolist,
+                                             sort_holdingpen_query)
+
+        for sort_key in HOLDINGPEN_SQL_SORTS:
+            query, terms = get_holdingpen_query(["HALTED"])
+            self.assertEqual([], terms)
+            self.assertEqual(
+                self._get_ids(sort_bwolist(get_holdingpen_objects(["HALTED"]),
+                                           sort_key)),
+                self._get_ids(sort_holdingpen_query(query, sort_key))
+            )
+
+    def test_sort_missing_values(self):
+        """Test that objects without sort key sort the same in SQL."""
+        from invenio_ext.sqlalchemy import db
+        from invenio_workflows.definitions import WorkflowBase
+        from invenio_workflows.registry import workflows
+        from invenio_workflows.utils import (get_holdingpen_objects,
+                                             get_holdingpen_query,
+                                             sort_bwolist,
+                                             sort_holdingpen_query)
+
+        class SortTest(WorkflowBase):
+            workflow = []
+
+            @staticmethod
+            def get_sort_data(obj, **kwargs):
+                if obj.data_type == "test_type_0":
+                    return {"priority": 1}
+                return {"priority": None}
+
+        workflows['sorttest'] = SortTest
+        try:
+            self.workflow.name = "sorttest"
+            db.session.commit()
+            for obj in self.objects:
+                obj.save()
+
+            for sort_key in ("priority", "priority_desc"):
+                query, terms = get_holdingpen_query(["HALTED"])
+                self.assertEqual(
+                    self._get_ids(sort_bwolist(
+                        get_holdingpen_objects(["HALTED"]), sort_key)),
+                    self._get_ids(sort_holdingpen_query(query, sort_key))
+                )
+            query, terms = get_holdingpen_query(["HALTED"])
+            self.assertEqual(
+                [self.objects[1].id, self.objects[3].id,
+                 self.objects[0].id, self.objects[2].id],
+                self._get_ids(sort_holdingpen_query(query, "priority"))
+            )
+        finally:
+            del workflows['sorttest']
+
+    def test_projection(self):
+        """Test searching and sorting on values stored along objects."""
+        from invenio_workflows.utils import (get_holdingpen_query,
+                                             sort_holdingpen_query)
+
+        for obj in self.objects:
+            obj.save()
+        self.assertEqual("no title", self.objects[0].projection.title.lower())
+
+        query, terms = get_holdingpen_query(["HALTED", "TEST_TYPE_1"])
+        self.assertEqual([], terms)
+        self.assertEqual([self.objects[1].id, self.objects[3].id],
+                         self._get_ids(sort_holdingpen_query(query, "title")))
+        self.assertEqual(
+            [self.objects[3].id, self.objects[1].id],
+            self._get_ids(sort_holdingpen_query(query, "title_desc"))
+        )
+
+    def test_projection_after_commit(self):
+        """Test that projections are computed once the objects commit."""
+        from invenio_workflows.api import batch
+
+        obj = self.objects[0]
+        with batch():
+            obj.save()
+            self.assertEqual(None, obj.projection)
+        self.assertEqual("no title", obj.projection.title.lower())
+        self.assertFalse("data" in obj.__dict__)
+
+    def test_search_index(self):
+        """Test that all words must start a word of the object."""
+        from invenio_workflows.utils import get_holdingpen_query
+
+        for obj in self.objects:
+            obj.save()
+        query, terms = get_holdingpen_query(["HALTED", "tit test_type_0"])
+        self.assertEqual([self.objects[0].id, self.objects[2].id],
+                         sorted(self._get_ids(query)))
+        query, terms = get_holdingpen_query(["HALTED", "itle"])
+        self.assertEqual([], self._get_ids(query))
+
+    def test_filter_in_sql(self):
+        """Test that type tags are turned into SQL criteria."""
+        from invenio_workflows.utils import (count_holdingpen_objects,
+                                             get_holdingpen_query)
+
+        query, terms = get_holdingpen_query(["HALTED", "type:test_type_1",
+                                             "some text"])
+        self.assertEqual(["some text"], terms)
+        self.assertEqual([self.objects[1].id, self.objects[3].id],
+                         sorted(self._get_ids(query)))
+        self.assertEqual(
+            2, count_holdingpen_objects(["HALTED", "type:test_type_*"]) -
+            count_holdingpen_objects(["HALTED", "type:test_type_1"])
+        )
+
+    def test_formatted_objects_cache(self):
+        """Test that formatted objects are cached per modification date."""
+        from datetime import timedelta
+        from invenio_workflows.utils import (generate_formatted_holdingpen_object,
+                                             get_formatted_holdingpen_objects,
+                                             get_holdingpen_cache_key)
+
+        expected = [generate_formatted_holdingpen_object(obj)
+                    for obj in self.objects]
+        self.assertEqual(expected,
+                         get_formatted_holdingpen_objects(self.objects))
+        self.assertEqual(expected,
+                         get_formatted_holdingpen_objects(self.objects))
+
+        key = get_holdingpen_cache_key(self.objects[0])
+        self.objects[0].modified += timedelta(seconds=1)
+        self.assertNotEqual(key, get_holdingpen_cache_key(self.objects[0]))
+
+    def test_formatted_objects_date_format(self):
+        """Test that formatted objects are cached per date format."""
+        from invenio_workflows.utils import get_formatted_holdingpen_object
+
+        obj = self.objects[0]
+        self.assertEqual(obj.modified.strftime("%Y-%m-%d %H:%M:%S.%f"),
+                         get_formatted_holdingpen_object(obj)["date"])
+        self.assertEqual(
+            obj.modified.strftime("%Y-%m-%d"),
+            get_formatted_holdingpen_object(obj, date_format="%Y-%m-%d")["date"]
+        )
+
+    def test_formatted_objects_in_threads(self):
+        """Test that objects formatted in threads are the same."""
+        from invenio_workflows.utils import (close_row_pool,
+                                             generate_formatted_holdingpen_object,
+                                             get_formatted_holdingpen_objects)
+
+        expected = [generate_formatted_holdingpen_object(obj)
+                    for obj in self.objects]
+        self.app.config["WORKFLOWS_HOLDING_PEN_ROW_WORKERS"] = 2
+        try:
+            self.assertEqual(expected, get_formatted_holdingpen_objects(
+                self.objects, timeout=30))
+        finally:
+            self.app.config["WORKFLOWS_HOLDING_PEN_ROW_WORKERS"] = 0
+            close_row_pool()
+
+    def test_previous_next(self):
+        """Test that neighbours are found without the list of ids."""
+        from invenio_workflows.utils import (HOLDINGPEN_SQL_SORTS,
+                                             get_holdingpen_previous_next,
+                                             get_holdingpen_query,
+                                             get_previous_next_objects,
+                                             sort_holdingpen_query)
+
+        tags = ["HALTED", "type:test_type_*"]
+        for obj in self.objects:
+            obj.save()
+        for sort_key in list(HOLDINGPEN_SQL_SORTS) + ["title", "title_desc"]:
+            query, terms = get_holdingpen_query(tags)
+            ids = [obj.id for obj in sort_holdingpen_query(query, sort_key)]
+            for obj in self.objects:
+                self.assertEqual(
+                    get_previous_next_objects(ids, obj.id),
+                    get_holdingpen_previous_next(tags, sort_key, obj)
+                )
+
+    def test_export(self):
+        """Test that exports list the objects line by line."""
+        import json
+        from invenio_workflows.utils import (HOLDINGPEN_EXPORT_COLUMNS,
+                                             export_holdingpen)
+
+        for obj in self.objects:
+            obj.save()
+        tags = ["HALTED", "type:test_type_1"]
+        entries = [json.loads(line)
+                   for line in export_holdingpen(tags, chunk_size=1)]
+        exported = set(entry["id"] for entry in entries)
+        self.assertEqual(set([self.objects[1].id, self.objects[3].id]),
+                         exported & set(obj.id for obj in self.objects))
+        for entry in entries:
+            self.assertEqual("HALTED", entry["version"])
+            self.assertTrue("data" in entry)
+
+        lines = list(export_holdingpen(tags, "csv", chunk_size=1))
+        self.assertEqual(",".join(HOLDINGPEN_EXPORT_COLUMNS),
+                         lines[0].strip())
+        self.assertEqual(len(entries) + 1, len(lines))
+
+    def test_counters(self):
+        """Test that counters follow the objects and can be recomputed."""
+        from invenio_ext.sqlalchemy import db
+        from invenio_workflows.models import (BibWorkflowObjectCounter,
+                                              ObjectVersion)
+        from invenio_workflows.utils import get_holdingpen_counts
+
+        # Objects of other tests are deleted without updating counters
+        BibWorkflowObjectCounter.reconcile()
+        db.session.commit()
+        for obj in self.objects:
+            obj.save()
+        self.assertEqual({ObjectVersion.HALTED: 2},
+                         get_holdingpen_counts(data_type="test_type_1"))
+
+        self.objects[1].save(version=ObjectVersion.ERROR)
+        self.assertEqual({ObjectVersion.HALTED: 1, ObjectVersion.ERROR: 1},
+                         get_holdingpen_counts(data_type="test_type_1"))
+
+        BibWorkflowObjectCounter.reconcile()
+        db.session.commit()
+        self.assertEqual({ObjectVersion.HALTED: 1, ObjectVersion.ERROR: 1},
+                         get_holdingpen_counts(data_type="test_type_1"))
+
+    def test_counter_upsert(self):
+        """Test that counters are created on the first increment only."""
+        from invenio_workflows.models import BibWorkflowObjectCounter
+
+        key = (0, "test_type_upsert", "", 0)
+        BibWorkflowObjectCounter.add(key, -1)
+        self.assertEqual({}, BibWorkflowObjectCounter.get_counts(
+            data_type="test_type_upsert"))
+        BibWorkflowObjectCounter.add_many({key: 1})
+        BibWorkflowObjectCounter.add_many({key: 2})
+        self.assertEqual({0: 3}, BibWorkflowObjectCounter.get_counts(
+            data_type="test_type_upsert"))
+        BibWorkflowObjectCounter.query.filter_by(
+            data_type="test_type_upsert").delete()
+
+    def test_action_column(self):
+        """Test that objects awaiting an action are found in SQL."""
+        from invenio_workflows.models import BibWorkflowObject
+        from invenio_workflows.utils import get_holdingpen_query
+
+        self.objects[0].set_action("approval", "Accept or reject.")
+        self.objects[0].save()
+        self.assertEqual("approval", self.objects[0].get_action())
+        self.assertEqual([self.objects[0].id],
+                         self._get_ids(BibWorkflowObject.get_awaiting()))
+        self.assertEqual(
+            [self.objects[0].id],
+            self._get_ids(BibWorkflowObject.get_awaiting("approval"))
+        )
+        query, terms = get_holdingpen_query(["HALTED", "action:approval"])
+        self.assertEqual([self.objects[0].id], self._get_ids(query))
+
+        self.objects[0].remove_action()
+        self.objects[0].save()
+        self.assertEqual(None, self.objects[0].get_action())
+        self.assertEqual([], self._get_ids(BibWorkflowObject.get_awaiting()))
+
+
+class ExtraDataProxyTest(InvenioTestCase):
+
+    """Test the tracking of modifications on extra data."""
+
+    def test_reads_do_not_modify(self):
+        """Test that reading immutable values is not a modification."""
+        from invenio_workflows.utils import ExtraDataProxy
+        proxy = ExtraDataProxy({"count": 1, "name": "test"})
+        self.assertEqual(1, proxy["count"])
+        self.assertTrue("name" in proxy)
+        self.assertEqual("test", proxy.get("name"))
+        self.assertFalse(proxy.modified)
+
+    def test_writes_modify(self):
+        """Test that setting and deleting keys are modifications."""
+        from invenio_workflows.utils import ExtraDataProxy
+        data = {"count": 1}
+        proxy = ExtraDataProxy(data)
+        proxy["count"] += 1
+        self.assertTrue(proxy.modified)
+        self.assertEqual(2, data["count"])
+
+        proxy.modified = False
+        del proxy["count"]
+        self.assertTrue(proxy.modified)
+        self.assertEqual({}, data)
+
+    def test_mutable_reads_modify(self):
+        """Test that reading mutable values is considered a modification."""
+        from invenio_workflows.utils import ExtraDataProxy
+        proxy = ExtraDataProxy({"ids": []})
+        proxy["ids"].append(1)
+        self.assertTrue(proxy.modified)
+        self.assertEqual([1], proxy.data["ids"])
@@ -325,6 +325,65 @@ distances from it.
         self.assertEqual(initial_data, test_object.get_data())
         self.assertEqual(ObjectVersion.INITIAL, test_object.version)
 
+    def test_workflow_object_creation_bulk(self):
+        """Test that objects created in chunks keep order and snapshots."""
+        from invenio_workflows.models import (BibWorkflowObject,
+                                              ObjectVersion)
+        from invenio_workflows.api import start
+
+        self.app.config["WORKFLOWS_BULK_INGESTION_CHUNK_SIZE"] = 2
+        try:
+            workflow = start(workflow_name="demo_workflow",
+                             data=[21, 22, 23, 24, 25],
+                             module_name="unit_tests")
+        finally:
+            self.app.config["WORKFLOWS_BULK_INGESTION_CHUNK_SIZE"] = 1000
+
+        objects = BibWorkflowObject.query.filter(
+            BibWorkflowObject.id_workflow == workflow.uuid,
+            BibWorkflowObject.id_parent == None  # noqa E711
+        ).order_by(BibWorkflowObject.id).all()
+        self.assertEqual([39, 40, 41, 42, 43],
+                         [obj.get_data() for obj in objects])
+        # Columns not given take the defaults of the model
+        self.assertEqual([0] * 5, [obj.id_user for obj in objects])
+        for initial_data, obj in enumerate(objects, 21):
+            snapshot = BibWorkflowObject.query.filter(
+                BibWorkflowObject.id_parent == obj.id).one()
+            self.assertEqual(ObjectVersion.INITIAL, snapshot.version)
+            self.assertEqual(initial_data, snapshot.get_data())
+            self.assertEqual(workflow.uuid, snapshot.id_workflow)
+
+    def test_workflow_commit_policy(self):
+        """Test that batched commits keep every object durable."""
+        from invenio_ext.sqlalchemy import db
+        from invenio_workflows.models import (BibWorkflowObject,
+                                              ObjectVersion)
+        from invenio_workflows.api import start
+
+        for policy in ({}, {"objects": 2}, {"seconds": 60}):
+            self.app.config["WORKFLOWS_COMMIT_POLICY"] = policy
+            try:
+                workflow = start(workflow_name="demo_workflow",
+                                 data=[25, 5, 26, 27],
+                                 module_name="unit_tests")
+            finally:
+                self.app.config["WORKFLOWS_COMMIT_POLICY"] = None
+
+            # Nothing must be left in the session only
+            db.session.rollback()
+            objects = BibWorkflowObject.query.filter(
+                BibWorkflowObject.id_workflow == workflow.uuid,
+                BibWorkflowObject.id_parent == None  # noqa E711
+            ).order_by(BibWorkflowObject.id).all()
+            self.assertEqual([ObjectVersion.COMPLETED,
+                              ObjectVersion.WAITING,
+                              ObjectVersion.COMPLETED,
+                              ObjectVersion.COMPLETED],
+                             [obj.version for obj in objects])
+            self.assertEqual([43, 5, 44, 45],
+                             [obj.get_data() for obj in objects])
+
     def test_workflow_complex_run(self):
         """Test running workflow with several data objects."""
         from invenio_workflows.models import (BibWorkflowObject,
@@ -485,6 +544,121 @@ distances from it.
                 messages_found += 1
         self.assertEqual(2, messages_found)
 
+    def test_logging_is_buffered(self):
+        """Test that log records are written with the next commit only."""
+        from threading import Thread
+        from invenio_workflows.models import (BibWorkflowObject,
+                                              BibWorkflowObjectLog,
+                                              ObjectVersion)
+
+        obj = BibWorkflowObject(id_workflow=None,
+                                version=ObjectVersion.INITIAL)
+        obj.set_data(20)
+        obj.save()
+
+        message = "This is a buffered message"
+        obj.log.error(message)
+        query = BibWorkflowObjectLog.query.filter(
+            BibWorkflowObjectLog.id_object == obj.id,
+            BibWorkflowObjectLog.message == message)
+        self.assertEqual(0, query.count())
+
+        obj.save()
+        self.assertEqual(1, query.count())
+
+        # Records of other threads wait for the commit of their session
+        def log_in_thread():
+            with self.app.app_context():
+                obj.log.error("This is a message of another thread")
+
+        thread = Thread(target=log_in_thread)
+        thread.start()
+        thread.join()
+        obj.save()
+        self.assertEqual(0, BibWorkflowObjectLog.query.filter(
+            BibWorkflowObjectLog.id_object == obj.id,
+            BibWorkflowObjectLog.message ==
+            "This is a message of another thread").count())
+
+    def test_logging_levels(self):
+        """Test that records below the database level are not stored."""
+        from invenio_workflows.models import (BibWorkflowObject,
+                                              BibWorkflowObjectLog,
+                                              ObjectVersion)
+
+        self.app.config["WORKFLOWS_LOG_DB_LEVEL"] = "WARNING"
+        try:
+            obj = BibWorkflowObject(id_workflow=None,
+                                    version=ObjectVersion.INITIAL)
+            obj.set_data(20)
+            obj.save()
+            obj.log.info("This is an info message")
+            obj.log.warning("This is a %s message", "warning")
+            obj.save()
+        finally:
+            self.app.config["WORKFLOWS_LOG_DB_LEVEL"] = "INFO"
+
+        self.assertEqual(
+            ["This is a warning message"],
+            [log.message for log in BibWorkflowObjectLog.query.filter(
+                BibWorkflowObjectLog.id_object == obj.id)]
+        )
+
+    def test_loggers_are_shared(self):
+        """Test that objects do not get a logger of their own."""
+        from invenio_workflows.models import (BibWorkflowObject,
+                                              BibWorkflowObjectLog,
+                                              ObjectVersion)
+
+        loggers = len(logging.Logger.manager.loggerDict)
+        objects = []
+        for data in range(3):
+            obj = BibWorkflowObject(id_workflow=None,
+                                    version=ObjectVersion.INITIAL)
+            obj.set_data(data)
+            obj.save()
+            obj.log.error("This is an error message")
+            objects.append(obj)
+        objects[0].save()
+
+        self.assertEqual(1, len(set(obj.log.logger for obj in objects)))
+        self.assertTrue(len(logging.Logger.manager.loggerDict) <= loggers + 1)
+        for obj in objects:
+            self.assertEqual(1, BibWorkflowObjectLog.query.filter(
+                BibWorkflowObjectLog.id_object == obj.id).count())
+
+    def test_batch_delete(self):
+        """Test deleting several objects in one batch."""
+        from sqlalchemy.orm.exc import NoResultFound
+        from invenio_workflows.api import (batch, delete_objects, in_batch,
+                                           start)
+        from invenio_workflows.errors import WorkflowAPIError
+        from invenio_workflows.models import (BibWorkflowObject,
+                                              ObjectVersion)
+
+        with batch():
+            self.assertTrue(in_batch())
+            objects = []
+            for data in range(3):
+                obj = BibWorkflowObject(id_workflow=None,
+                                        version=ObjectVersion.INITIAL)
+                obj.set_data(data)
+                obj.save()
+                objects.append(obj)
+        self.assertFalse(in_batch())
+
+        ids = [obj.id for obj in objects]
+        self.assertEqual(3, BibWorkflowObject.query.filter(
+            BibWorkflowObject.id.in_(ids)).count())
+        self.assertRaises(NoResultFound, delete_objects, ids + [max(ids) + 1])
+        self.assertEqual(3, BibWorkflowObject.query.filter(
+            BibWorkflowObject.id.in_(ids)).count())
+        with batch():
+            self.assertRaises(WorkflowAPIError, start, "demo_workflow", [1])
+        self.assertEqual(3, delete_objects(ids + [ids[0]]))
+        self.assertEqual(0, BibWorkflowObject.query.filter(
+            BibWorkflowObject.id.in_(ids)).count())
+
     def test_workflow_for_running_object(self):
         """Test workflow with running object given and watch it fail."""
         from invenio_workflows.models import (BibWorkflowObject,
@@ -567,6 +741,112 @@ distances from it.
         self.assertEqual(37, obj_halted.get_data())
         self.assertEqual(ObjectVersion.COMPLETED, obj_halted.version)
 
+    def test_resume_objects(self):
+        """Test resuming all the halted objects of a workflow."""
+        from invenio_workflows.registry import workflows
+        from invenio_workflows.api import resume_objects, start
+        from invenio_workflows.models import (BibWorkflowObject,
+                                              ObjectVersion, Workflow)
+        from invenio_workflows.worker_engine import continue_objects_worker
+
+        def halt_engine(obj, eng):
+            return eng.halt("Test", action="approval")
+
+        def add_one(obj, eng):
+            obj.set_data(obj.get_data() + 1)
+
+        class ResumeTest(object):
+            workflow = [halt_engine, add_one]
+
+        workflows['resumetest'] = ResumeTest
+
+        engine = start('resumetest', [1, 2], module_name="unit_tests")
+        halted = engine.halted_objects
+        self.assertEqual(2, len(halted))
+
+        outcomes = list(resume_objects(engine.uuid, workers=0,
+                                       module_name="unit_tests"))
+        self.assertEqual(
+            [(obj.id, ObjectVersion.COMPLETED) for obj in halted], outcomes
+        )
+        self.assertEqual([2, 3], [
+            BibWorkflowObject.query.get(obj.id).get_data() for obj in halted
+        ])
+        self.assertEqual([], list(resume_objects(engine.uuid, workers=0)))
+
+        # Chunks continued concurrently leave the engine to the caller
+        modified = Workflow.query.get(engine.uuid).modified
+        self.assertEqual([], list(continue_objects_worker(
+            engine.uuid, [], save_engine=False, module_name="unit_tests")))
+        self.assertEqual(modified, Workflow.query.get(engine.uuid).modified)
+
+        # Closing the generator leaves the objects not started halted
+        engine = start('resumetest', [1, 2, 3, 4], module_name="unit_tests")
+        outcomes = resume_objects(engine.uuid, workers=2,
+                                  module_name="unit_tests")
+        self.assertEqual(ObjectVersion.COMPLETED, next(outcomes)[1])
+        outcomes.close()
+        counts = engine.get_object_counts()
+        self.assertTrue(counts.get(ObjectVersion.COMPLETED, 0) >= 1)
+        self.assertEqual(4, counts.get(ObjectVersion.COMPLETED, 0) +
+                         counts.get(ObjectVersion.HALTED, 0))
+
+    def test_completion_counters(self):
+        """Test that counters detect completion like the objects do."""
+        from invenio_workflows.api import continue_oid, start, start_by_wid
+        from invenio_workflows.models import (BibWorkflowObject,
+                                              ObjectVersion)
+
+        engine = start("demo_workflow", data=[1], module_name="unit_tests")
+        self.assertEqual(1, engine.db_obj.counter_initial)
+        self.assertEqual(1, engine.db_obj.counter_halted)
+        self.assertFalse(engine.has_completed())
+        self.assertFalse(engine.has_completed(verify=True))
+
+        obj_halted = BibWorkflowObject.query.filter(
+            BibWorkflowObject.id_workflow == engine.uuid,
+            BibWorkflowObject.version == ObjectVersion.WAITING
+        ).one()
+        engine = continue_oid(oid=obj_halted.id, module_name="unit_tests")
+        self.assertEqual(1, engine.db_obj.counter_initial)
+        self.assertEqual(0, engine.db_obj.counter_halted)
+        self.assertEqual(1, engine.db_obj.counter_finished)
+        self.assertTrue(engine.has_completed())
+        self.assertTrue(engine.has_completed(verify=True))
+
+        # Running the object again does not count it twice
+        engine = continue_oid(oid=obj_halted.id, start_point="restart_prev",
+                              module_name="unit_tests")
+        self.assertEqual(1, engine.db_obj.counter_finished)
+        self.assertTrue(engine.has_completed())
+
+        # Restarted objects are counted again from scratch
+        engine = start_by_wid(engine.uuid, data=[obj_halted.id],
+                              module_name="unit_tests")
+        self.assertEqual(1, engine.db_obj.counter_initial)
+        for counter in (engine.db_obj.counter_halted,
+                        engine.db_obj.counter_error,
+                        engine.db_obj.counter_finished):
+            self.assertTrue(0 <= counter <= 1)
+
+    def test_objects_of_statuses(self):
+        """Test that objects are filtered and counted in SQL."""
+        from invenio_workflows.api import start
+        from invenio_workflows.models import ObjectVersion
+
+        engine = start("demo_workflow", data=[1], module_name="unit_tests")
+        waiting = engine.waiting_objects
+        self.assertEqual([1], [obj.get_data() for obj in waiting])
+        self.assertEqual(1, len(engine.initial_objects))
+        self.assertEqual([], engine.error_objects)
+
+        self.assertEqual(2, engine.count_objects_of_statuses(
+            [ObjectVersion.INITIAL, ObjectVersion.WAITING]))
+        self.assertEqual(0, engine.count_objects_of_statuses(
+            [ObjectVersion.ERROR]))
+        self.assertEqual({ObjectVersion.INITIAL: 1, ObjectVersion.WAITING: 1},
+                         engine.get_object_counts())
+
     def test_restart_workflow(self):
         """Test restarting workflow for given workflow id."""
         from invenio_workflows.models import (BibWorkflowObject,
@@ -74,3 +74,154 @@ class TestWorkflowModels(InvenioTestCase):
             db.session.query(
                 Workflow.query.filter(
                     Workflow.uuid == w_uuid).exists()).scalar())
+
+    def test_working_state(self):
+        """Test that the working state defers encoding until saved."""
+        obj = self.bibworkflowobject
+        obj.set_data({"title": "Initial"})
+        blob = obj._data
+
+        obj.enable_working_state()
+        data = obj.get_data()
+        data["title"] = "Changed"
+        obj.set_data(data)
+        self.assertTrue(obj.get_data() is data)
+        self.assertTrue(obj._data is blob)
+
+        obj.flush_working_state()
+        self.assertFalse(obj._data is blob)
+        obj.disable_working_state()
+        self.assertEqual({"title": "Changed"}, obj.get_data())
+        self.assertFalse(obj.get_data() is data)
+
+    def test_legacy_extra_data(self):
+        """Test that the deprecated uuid argument still reads and writes."""
+        import warnings
+        from invenio_workflows.models import Workflow
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            self.workflow.set_extra_data(uuid=self.workflow.uuid,
+                                         key="legacy", value=1)
+            self.assertEqual(1, self.workflow.get_extra_data(
+                uuid=self.workflow.uuid, key="legacy"))
+        self.assertEqual(2, len(caught))
+        self.assertTrue(issubclass(caught[0].category, DeprecationWarning))
+        self.assertEqual(1, Workflow.get(
+            Workflow.uuid == self.workflow.uuid
+        ).one().get_extra_data(key="legacy"))
+
+    def test_engine_extra_data_kept(self):
+        """Test that extra data set on the workflow directly is kept."""
+        import warnings
+        from invenio_workflows.engine import BibWorkflowEngine
+        from invenio_workflows.models import Workflow
+
+        engine = BibWorkflowEngine(workflow_object=self.workflow)
+        engine.extra_data["engine"] = 1
+        engine.flush_extra_data()
+        self.workflow.set_extra_data(key="direct", value=2)
+        self.assertEqual(2, engine.extra_data["direct"])
+        engine.extra_data["engine"] = 3
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            self.workflow.set_extra_data(uuid=self.workflow.uuid,
+                                         key="legacy", value=4)
+        engine.save()
+
+        extra_data = Workflow.get(
+            Workflow.uuid == self.workflow.uuid).one().get_extra_data()
+        self.assertEqual(2, extra_data["direct"])
+        self.assertEqual(4, extra_data["legacy"])
+
+    def test_deferred_data(self):
+        """Test that encoded columns are only fetched when needed."""
+        from invenio_workflows.models import BibWorkflowObject
+        self.bibworkflowobject.set_data({"title": "Deferred"})
+        self.bibworkflowobject.save()
+        db.session.expire(self.bibworkflowobject)
+
+        obj = BibWorkflowObject.get(id=self.bibworkflowobject.id).one()
+        self.assertTrue("_data" in db.inspect(obj).unloaded)
+        self.assertTrue("_extra_data" in db.inspect(obj).unloaded)
+        BibWorkflowObject.load_data([obj])
+        self.assertFalse("_data" in db.inspect(obj).unloaded)
+        self.assertFalse("_extra_data" in db.inspect(obj).unloaded)
+        self.assertEqual({"title": "Deferred"}, obj.get_data())
+
+        db.session.expire(obj)
+        obj = BibWorkflowObject.get_with_data(
+            id=self.bibworkflowobject.id).one()
+        self.assertFalse("_data" in db.inspect(obj).unloaded)
+
+
+class TestQueryPlans(InvenioTestCase):
+
+    """Test that the frequent queries use the composite indexes."""
+
+    def setUp(self):
+        """Create the tables in an SQLite database."""
+        from sqlalchemy import create_engine
+        from invenio_workflows.models import (BibWorkflowEngineLog,
+                                              BibWorkflowObject,
+                                              BibWorkflowObjectLog,
+                                              Workflow)
+
+        self.engine = create_engine("sqlite://")
+        db.metadata.create_all(self.engine, tables=[
+            Workflow.__table__,
+            BibWorkflowObject.__table__,
+            BibWorkflowObjectLog.__table__,
+            BibWorkflowEngineLog.__table__,
+        ])
+
+    def tearDown(self):
+        """Drop the SQLite database."""
+        self.engine.dispose()
+
+    def _get_plan(self, query):
+        compiled = query.statement.compile(dialect=self.engine.dialect)
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(
+                "EXPLAIN QUERY PLAN " + str(compiled),
+                [compiled.params[name] for name in compiled.positiontup]
+            )
+            return " ".join(str(row[-1]) for row in cursor.fetchall())
+        finally:
+            connection.close()
+
+    def test_object_queries(self):
+        """Test the queries on workflow and parent objects."""
+        from invenio_workflows.models import BibWorkflowObject, ObjectVersion
+
+        plan = self._get_plan(BibWorkflowObject.query.filter(
+            BibWorkflowObject.id_workflow == "uuid",
+            BibWorkflowObject.version.in_([ObjectVersion.INITIAL,
+                                           ObjectVersion.COMPLETED])
+        ))
+        self.assertTrue("ix_bwlOBJECT_id_workflow_version" in plan, plan)
+
+        plan = self._get_plan(BibWorkflowObject.query.filter(
+            BibWorkflowObject.id_parent == None,  # noqa E711
+            BibWorkflowObject.version == ObjectVersion.HALTED
+        ))
+        self.assertTrue("ix_bwlOBJECT_id_parent_version" in plan, plan)
+
+    def test_log_queries(self):
+        """Test the queries on the logs of objects and workflows."""
+        from invenio_workflows.models import (BibWorkflowEngineLog,
+                                              BibWorkflowObjectLog)
+
+        for model, object_id in ((BibWorkflowObjectLog, 1),
+                                 (BibWorkflowEngineLog, "uuid")):
+            plan = self._get_plan(model.query.filter(
+                model.id_object == object_id,
+                model.log_type == 40
+            ).order_by(model.created))
+            self.assertTrue(
+                "ix_%s_id_object_log_type_created" % model.__tablename__
+                in plan, plan
+            )
+            self.assertFalse("TEMP B-TREE" in plan, plan)
@@ -23,6 +23,15 @@
 from test_workflows import WorkflowTasksTestCase
 
 
+def discard_parent_engine():
+    """Discard the inherited connections in a process of the pool."""
+    import os
+    from invenio_workflows.workers import worker_multiprocessing
+
+    worker_multiprocessing._discard_parent_engine()
+    return os.getpid()
+
+
 class WorkflowOthers(WorkflowTasksTestCase):
 
     """Class to test the other tasks and workflows."""
@@ -60,6 +69,45 @@ class WorkflowOthers(WorkflowTasksTestCase):
         except Exception as e:
             self.assertTrue(isinstance(e, TypeError))
 
+    def test_multiprocessing_result(self):
+        """Test the results of the multiprocessing worker."""
+        from concurrent.futures import Future
+        from invenio_workflows.workers.worker_multiprocessing import \
+            MultiprocessingResult
+
+        future = Future()
+        result = MultiprocessingResult(future)
+        self.assertEqual("PENDING", result.status)
+        future.set_running_or_notify_cancel()
+        self.assertEqual("STARTED", result.status)
+        future.set_result("uuid")
+        self.assertEqual("SUCCESS", result.status)
+        self.assertEqual("uuid", result.get())
+        self.assertEqual("UUID", result.get(lambda uuid: uuid.upper()))
+
+        future = Future()
+        future.set_exception(ValueError())
+        self.assertEqual("FAILURE", MultiprocessingResult(future).status)
+
+    def test_multiprocessing_keeps_parent_connections(self):
+        """Test that processes of the pool leave the parent connections."""
+        import os
+        from invenio_ext.sqlalchemy import db
+        from invenio_workflows.workers import worker_multiprocessing
+
+        # Leave a connection in the pool of the parent process
+        self.assertEqual(1, db.session.execute("SELECT 1").scalar())
+        db.session.commit()
+        executor = worker_multiprocessing.get_executor()
+        try:
+            pid = executor.submit(discard_parent_engine).result(timeout=60)
+            self.assertNotEqual(os.getpid(), pid)
+            self.assertEqual(1, db.session.execute("SELECT 1").scalar())
+            db.session.commit()
+        finally:
+            executor.shutdown()
+            worker_multiprocessing._executor = None
+
     def test_acces_to_undefineworkflow(self):
         """Test of access to undefined workflow."""
         from invenio_workflows.api import start